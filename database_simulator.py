@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import sqlite3
-from typing import Tuple
+import threading
+from typing import TYPE_CHECKING, Tuple
 
-import pandas as pd
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 SAMPLE_DATA = {
@@ -64,25 +66,64 @@ INSERT_STATEMENTS = {
 }
 
 
-def build_demo_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(":memory:")
+def build_demo_connection(check_same_thread: bool = True) -> sqlite3.Connection:
+    # Autocommit explícito: el DDL y los INSERT van en una sola transacción.
+    # (executescript haría COMMIT implícito antes de cada script).
+    conn = sqlite3.connect(":memory:", check_same_thread=check_same_thread, isolation_level=None)
     cursor = conn.cursor()
+    cursor.execute("BEGIN")
     for table, ddl in CREATE_TABLE_STATEMENTS.items():
-        cursor.executescript(ddl)
+        cursor.execute(ddl)
     for table, rows in SAMPLE_DATA.items():
         cursor.executemany(INSERT_STATEMENTS[table], rows)
-    conn.commit()
+    cursor.execute("COMMIT")
+    # Restaurar el modo transaccional por defecto para quien use la conexión
+    conn.isolation_level = ""
+    return conn
+
+
+# Conexión plantilla con el esquema y los datos de ejemplo ya cargados.
+# Se construye una sola vez y se clona por consulta con la API de backup de
+# SQLite, en lugar de repetir el DDL y los INSERT en cada ejecución.
+_TEMPLATE_CONN: sqlite3.Connection | None = None
+_TEMPLATE_LOCK = threading.Lock()
+
+
+def _get_template_connection() -> sqlite3.Connection:
+    global _TEMPLATE_CONN
+    with _TEMPLATE_LOCK:
+        if _TEMPLATE_CONN is None:
+            # Streamlit ejecuta cada sesión en su propio hilo
+            _TEMPLATE_CONN = build_demo_connection(check_same_thread=False)
+        return _TEMPLATE_CONN
+
+
+def clone_demo_connection() -> sqlite3.Connection:
+    """
+    Devuelve una copia independiente de la base de ejemplo.
+    Cada consulta trabaja sobre su propia copia, por lo que una sentencia que
+    modifique datos no afecta a las ejecuciones posteriores.
+    """
+    conn = sqlite3.connect(":memory:")
+    template = _get_template_connection()
+    with _TEMPLATE_LOCK:
+        template.backup(conn)
     return conn
 
 
 def execute_demo_query(sql_text: str) -> Tuple[pd.DataFrame | None, str | None]:
-    conn = build_demo_connection()
+    import pandas as pd
+
+    conn = clone_demo_connection()
     try:
-        df = pd.read_sql_query(sql_text, conn)
+        # Directo sobre el cursor: evita la capa DBAPI de pd.read_sql_query
+        cursor = conn.execute(sql_text)
+        if cursor.description is None:
+            return None, "La sentencia no devuelve filas (solo se muestran resultados de SELECT)."
+        rows = cursor.fetchall()
+        df = pd.DataFrame.from_records(rows, columns=[d[0] for d in cursor.description])
         return df, None
     except Exception as ex:
         return None, str(ex)
     finally:
         conn.close()
-
-
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
 from typing import List, Dict
 from lark import Token
 
@@ -33,27 +32,26 @@ TOKEN_CATEGORY_MAP: Dict[str, str] = {
 }
 
 
-@dataclass
-class LexToken:
-    token: str
-    tipo: str
-    linea: int
-    columna: int
-
-
-def tokens_to_table(tokens: List[Token]) -> List[LexToken]:
-    rows: List[LexToken] = []
-    for t in tokens:
-        category = TOKEN_CATEGORY_MAP.get(t.type, t.type)
-        rows.append(
-            LexToken(
-                token=str(t),
-                tipo=category,
-                linea=getattr(t, "line", None) or getattr(t, "lineo", 0) or 0,
-                columna=getattr(t, "column", None) or getattr(t, "columno", 0) or 0,
-            )
-        )
-    return rows
-
-
-
+def tokens_to_table(tokens: List[Token]) -> Dict[str, List]:
+    """
+    Devuelve la tabla de tokens por columnas (token, tipo, linea, columna),
+    lista para construir el DataFrame sin pasar por un dict por fila.
+    """
+    n = len(tokens)
+    token_col: List = [None] * n
+    tipo_col: List = [None] * n
+    linea_col: List = [None] * n
+    columna_col: List = [None] * n
+    category = TOKEN_CATEGORY_MAP.get
+    for i, t in enumerate(tokens):
+        # Los Token de Lark siempre exponen line/column (None si no hay posición)
+        token_col[i] = str(t)
+        tipo_col[i] = category(t.type, t.type)
+        linea_col[i] = t.line or 0
+        columna_col[i] = t.column or 0
+    return {
+        "token": token_col,
+        "tipo": tipo_col,
+        "linea": linea_col,
+        "columna": columna_col,
+    }
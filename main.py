@@ -1,243 +1,339 @@
 from __future__ import annotations
 
-from typing import Dict, Any, List, Tuple
+from typing import TYPE_CHECKING, Dict, Any, List, Tuple
+from collections import OrderedDict
+from functools import lru_cache
 import difflib
+import os
 import re
+import sys
+import threading
 
-import pandas as pd
-from graphviz import Digraph
 from lark import Tree, Token, UnexpectedInput
 
-from parser_sql import parse_sql_to_ast, lex_sql
+from parser_sql import parse_sql_to_ast, parse_sql_tree, tokens_from_tree, lex_sql
 from lexer import tokens_to_table
-from semantic_analyzer import load_schema, analyze_semantics, Symbol
+from semantic_analyzer import load_schema, analyze_semantics, schema_mtime
 from database_simulator import execute_demo_query
 
-RESERVED_KEYWORDS = {"SELECT", "FROM", "WHERE", "AND", "OR", "AS"}
+# pandas y graphviz se importan en las funciones que los usan: importar main
+# (CLI, pruebas) no debe pagar su tiempo de carga si no se llega a usarlos.
+if TYPE_CHECKING:
+    from graphviz import Digraph
 
+RESERVED_KEYWORDS = {sys.intern(k) for k in ("SELECT", "FROM", "WHERE", "AND", "OR", "AS")}
 
-def ast_to_graphviz(ast: Tree) -> Digraph:
+# Etiquetas de nodos del AST que envuelven directamente un token, y nodos que
+# se muestran con su propio nombre en el grafo
+_LEAF_TAGS = frozenset({"IDENT", "NUMBER", "STRING", "OP", "STAR"})
+_RESERVED_TAGS = frozenset({"SELECT", "FROM", "WHERE", "AND", "OR"})
+
+# Prefijos de sangría de la vista textual del AST, indexados por profundidad
+_INDENTS: List[str] = [""]
+
+# Sugerencias didácticas para errores sintácticos: (terminales esperados que la
+# disparan, mensaje). Se evalúan en orden contra el conjunto `expected` de Lark.
+HINT_RULES: List[Tuple[frozenset, str]] = [
+    (frozenset({"FROM"}), "Agrega la cláusula FROM: FROM <tabla>"),
+    (frozenset({"COMMA"}), "Puede faltar una coma entre columnas, por ejemplo: SELECT col1, col2"),
+    (frozenset({"AS"}), "Si estás usando alias, utiliza AS: SELECT col AS alias"),
+    (frozenset({"LPAREN", "RPAREN"}), "Revisa paréntesis balanceados en la expresión WHERE"),
+    (frozenset({"EQ", "NEQ", "LT", "LTE", "GT", "GTE"}), "Falta un operador de comparación: =, !=, <>, <, <=, >, >="),
+]
+
+
+def ast_to_graphviz(ast: Tree, build_graph: bool = True, build_text: bool = True) -> Digraph:
     """
     Genera visualización del AST navegando el árbol Tree real según la estructura semántica.
     Estructura como compilador SQL real según la literatura:
     Query (SELECT) -> SelectExprs (columnas), From (tabla), Where -> BinaryExpression (Left, Operator, Right)
     Solo muestra tokens reales extraídos del árbol.
+    Con build_graph=False no se construye el Digraph (se devuelve None) y con
+    build_text=False no se genera la vista textual; las etiquetas siempre se recorren.
     """
-    graph = Digraph("AST", format="png")
-    graph.attr(rankdir="TB", fontsize="10", fontname="Helvetica")
-    
-    # Diccionario para mapear tokens a IDs de nodos
-    token_to_node_id: dict[str, str] = {}
+    graph = None
+    if build_graph:
+        from graphviz import Digraph
+        from graphviz.quoting import quote
+
+        graph = Digraph("AST", format="png")
+        graph.attr(rankdir="TB", fontsize="10", fontname="Helvetica")
+    # Líneas DOT ya formateadas; se vuelcan de una vez en graph.body al final
+    # en lugar de pasar por graph.node/graph.edge (que validan y citan cada llamada).
+    # Los IDs n<k> son identificadores DOT válidos y no necesitan comillas.
+    body: List[str] = []
+
+    # Cada nodo visitado del AST recibe su propio ID n<k>, aunque la etiqueta se
+    # repita (dos comparaciones "=", AND encadenados): así el grafo y la vista
+    # textual son un árbol. adjacency va de ID de nodo a IDs de sus hijos.
     id_to_label: dict[str, str] = {}
     adjacency: dict[str, List[str]] = {}
-    node_counter = [0]  # Contador para IDs únicos
+    node_counter = 0  # Contador para IDs únicos
     creation_order: List[str] = []
-    
-    def get_node_id(token_value: str) -> str:
-        """Obtiene o crea un ID de nodo para un token"""
-        if token_value not in token_to_node_id:
-            node_counter[0] += 1
-            node_id = f"n{node_counter[0]}"
-            token_to_node_id[token_value] = node_id
-            id_to_label[node_id] = token_value
-            creation_order.append(token_value)
-            adjacency.setdefault(token_value, [])
-            graph.node(node_id, token_value, shape="ellipse")
-        return token_to_node_id[token_value]
-    
+
+    def new_node(label: str) -> str:
+        """Crea un nodo nuevo con la etiqueta dada y devuelve su ID"""
+        nonlocal node_counter
+        node_counter += 1
+        node_id = f"n{node_counter}"
+        id_to_label[node_id] = label
+        creation_order.append(label)
+        adjacency[node_id] = []
+        if build_graph:
+            body.append(f"\t{node_id} [label={quote(label)} shape=ellipse]\n")
+        return node_id
+
+    def add_child(parent_id: str, label: str) -> str:
+        """Crea un nodo hijo de parent_id (arista incluida) y devuelve su ID"""
+        child_id = new_node(label)
+        adjacency[parent_id].append(child_id)
+        if build_graph:
+            body.append(f"\t{parent_id} -> {child_id}\n")
+        return child_id
+
     def extract_token_value(node: Tree | Token) -> str | None:
         """Extrae el valor del token real desde un nodo Tree o Token"""
         if isinstance(node, Token):
-            return str(node)
+            return sys.intern(str(node))
         elif isinstance(node, Tree):
             # Para nodos IDENT, NUMBER, STRING, OP, STAR, extraer el token interno
-            if node.data in {"IDENT", "NUMBER", "STRING", "OP", "STAR"}:
+            if node.data in _LEAF_TAGS:
                 if node.children:
+                    first = node.children[0]
                     # El primer hijo es el Token
-                    if isinstance(node.children[0], Token):
-                        return str(node.children[0])
-                    # Si es un Tree anidado (caso raro), buscar recursivamente
-                    elif isinstance(node.children[0], Tree):
-                        return extract_token_value(node.children[0])
+                    if isinstance(first, Token):
+                        return sys.intern(str(first))
+                    # Tree anidado: la gramática solo produce un nivel extra
+                    # (IDENT(IDENT(token)) en comparaciones), se desenvuelve sin recursión
+                    elif isinstance(first, Tree):
+                        if first.data in _LEAF_TAGS:
+                            if first.children and isinstance(first.children[0], Token):
+                                return sys.intern(str(first.children[0]))
+                        elif first.data in _RESERVED_TAGS:
+                            return first.data
+                        return None
             # Para palabras reservadas, devolver el nombre del nodo
-            if node.data in {"SELECT", "FROM", "WHERE", "AND", "OR"}:
+            if node.data in _RESERVED_TAGS:
                 return node.data
         return None
     
-    def find_token_in_tree(node: Tree, target_types: set) -> Token | None:
-        """Busca un token de tipo específico en el árbol"""
-        if isinstance(node, Token):
-            if node.type in target_types:
-                return node
-        elif isinstance(node, Tree):
-            for child in node.children:
-                result = find_token_in_tree(child, target_types)
-                if result:
-                    return result
-        return None
-    
     # Navegar el árbol SELECT_NODE
     if not isinstance(ast, Tree) or ast.data != "SELECT_NODE":
-        graph.node("n1", "AST inválido")
+        if build_graph:
+            graph.node("n1", "AST inválido")
         return graph, creation_order, "AST inválido"
     
     # SELECT es la raíz (Query)
-    select_node_id = get_node_id("SELECT")
-    root_id = select_node_id
-    
-    # Procesar hijos de SELECT_NODE: COLUMN_LIST, TABLE, WHERE_CLAUSE
-    for child in ast.children:
-        if isinstance(child, Tree):
-            if child.data == "COLUMN_LIST":
-                # COLUMN_LIST: extraer columnas (COLUMN -> IDENT)
-                for col_node in child.children:
-                    if isinstance(col_node, Tree) and col_node.data == "COLUMN":
-                        # COLUMN tiene IDENT como hijo
-                        if col_node.children:
-                            ident_node = col_node.children[0]
-                            if isinstance(ident_node, Tree) and ident_node.data == "IDENT":
-                                if ident_node.children and isinstance(ident_node.children[0], Token):
-                                    col_token = ident_node.children[0]
-                                    col_label = str(col_token)
-                                    col_id = get_node_id(col_label)
-                                    graph.edge(root_id, col_id)
-                                    adjacency[id_to_label[root_id]].append(col_label)
-                    elif isinstance(col_node, Tree) and col_node.data == "STAR":
-                        # SELECT *
-                        star_id = get_node_id("*")
-                        graph.edge(root_id, star_id)
-                        adjacency[id_to_label[root_id]].append("*")
-            
-            elif child.data == "TABLE":
-                # TABLE: FROM y tabla
-                from_id = get_node_id("FROM")
-                graph.edge(root_id, from_id)
-                adjacency[id_to_label[root_id]].append("FROM")
-                
-                # Extraer nombre de tabla
-                if child.children:
-                    table_node = child.children[0]
-                    if isinstance(table_node, Tree) and table_node.data == "IDENT":
-                        if table_node.children and isinstance(table_node.children[0], Token):
-                            table_token = table_node.children[0]
-                            table_label = str(table_token)
-                            table_id = get_node_id(table_label)
-                            graph.edge(from_id, table_id)
-                            adjacency[id_to_label[from_id]].append(table_label)
-            
-            elif child.data == "WHERE_CLAUSE":
-                # WHERE_CLAUSE: WHERE y expresión booleana
-                where_id = get_node_id("WHERE")
-                graph.edge(root_id, where_id)
-                adjacency[id_to_label[root_id]].append("WHERE")
-                
-                # Procesar expresión booleana (AND/OR/COMPARE)
-                if child.children:
-                    expr_node = child.children[0]
-                    _process_boolean_expr(expr_node, where_id, graph, get_node_id, extract_token_value, adjacency, id_to_label)
-    
-    # Construir representación textual jerárquica
-    def build_text(label: str, indent: int = 0) -> List[str]:
-        lines = [("  " * indent) + label]
-        for child in adjacency.get(label, []):
-            lines.extend(build_text(child, indent + 1))
+    root_id = new_node("SELECT")
+
+    # ASTBuilder.select_stmt fija los hijos de SELECT_NODE por posición:
+    # [COLUMN_LIST, TABLE, WHERE_CLAUSE?]
+    columns_node, table_ref = ast.children[0], ast.children[1]
+    where_node = ast.children[2] if len(ast.children) > 2 else None
+
+    # COLUMN_LIST: extraer columnas (COLUMN -> IDENT)
+    for col_node in columns_node.children:
+        if isinstance(col_node, Tree) and col_node.data == "COLUMN":
+            # COLUMN tiene IDENT como hijo
+            if col_node.children:
+                ident_node = col_node.children[0]
+                if isinstance(ident_node, Tree) and ident_node.data == "IDENT":
+                    if ident_node.children and isinstance(ident_node.children[0], Token):
+                        add_child(root_id, sys.intern(str(ident_node.children[0])))
+        elif isinstance(col_node, Tree) and col_node.data == "STAR":
+            # SELECT *
+            add_child(root_id, "*")
+
+    # TABLE: FROM y tabla
+    from_id = add_child(root_id, "FROM")
+
+    # Extraer nombre de tabla
+    if table_ref.children:
+        table_node = table_ref.children[0]
+        if isinstance(table_node, Tree) and table_node.data == "IDENT":
+            if table_node.children and isinstance(table_node.children[0], Token):
+                add_child(from_id, sys.intern(str(table_node.children[0])))
+
+    if where_node is not None:
+        # WHERE_CLAUSE: WHERE y expresión booleana
+        where_id = add_child(root_id, "WHERE")
+
+        # Procesar expresión booleana (AND/OR/COMPARE)
+        if where_node.children:
+            expr_node = where_node.children[0]
+            _process_boolean_expr(expr_node, where_id, add_child, extract_token_value)
+
+    # Construir representación textual jerárquica con una pila explícita
+    # (preorden, sin recursión). Las sangrías se toman de _INDENTS por
+    # profundidad: cada nivel se construye una sola vez por proceso en lugar
+    # de una vez por nodo.
+    def dump_lines(root: str) -> List[str]:
+        lines: List[str] = []
+        append_line = lines.append
+        indents = _INDENTS
+        stack: List[Tuple[str, int]] = [(root, 0)]
+        while stack:
+            node_id, depth = stack.pop()
+            if depth >= len(indents):
+                indents.append(indents[-1] + "  ")
+            append_line(indents[depth] + id_to_label[node_id])
+            # Apilar en orden inverso para conservar el preorden de izquierda a derecha
+            for child in reversed(adjacency[node_id]):
+                stack.append((child, depth + 1))
         return lines
 
-    ast_text = "\n".join(build_text("SELECT")) if "SELECT" in adjacency else ""
+    ast_text = "\n".join(dump_lines(root_id)) if build_text else ""
 
+    if build_graph:
+        graph.body.extend(body)
     return graph, creation_order, ast_text
 
 
-def _process_boolean_expr(expr_node: Tree, parent_id: str, graph: Digraph, 
-                           get_node_id, extract_token_value, adjacency, id_to_label):
-    """Procesa expresiones booleanas: AND, OR, COMPARE"""
-    if not isinstance(expr_node, Tree):
-        return
-    
-    if expr_node.data == "COMPARE":
-        # COMPARE: [OP, left, right]
-        # Estructura: Operator -> Left, Right
-        if len(expr_node.children) >= 3:
-            op_node = expr_node.children[0]  # OP
-            left_node = expr_node.children[1]  # IDENT/NUMBER/STRING
-            right_node = expr_node.children[2]  # IDENT/NUMBER/STRING
-            
-            # Extraer operador
-            op_value = extract_token_value(op_node)
-            if op_value:
-                op_id = get_node_id(op_value)
-                graph.edge(parent_id, op_id)
-                adjacency[id_to_label[parent_id]].append(op_value)
-                
-                # Left: puede ser IDENT anidado
-                left_value = extract_token_value(left_node)
-                if left_value:
-                    left_id = get_node_id(left_value)
-                    graph.edge(op_id, left_id)
-                    adjacency[id_to_label[op_id]].append(left_value)
-                elif isinstance(left_node, Tree):
-                    # Si es IDENT anidado, buscar recursivamente
-                    if left_node.data == "IDENT" and left_node.children:
-                        nested_value = extract_token_value(left_node.children[0])
-                        if nested_value:
-                            left_id = get_node_id(nested_value)
-                            graph.edge(op_id, left_id)
-                            adjacency[id_to_label[op_id]].append(nested_value)
-                
-                # Right: puede ser NUMBER, STRING, o IDENT
-                right_value = extract_token_value(right_node)
-                if right_value:
-                    right_id = get_node_id(right_value)
-                    graph.edge(op_id, right_id)
-                    adjacency[id_to_label[op_id]].append(right_value)
-                elif isinstance(right_node, Tree):
-                    # Si es IDENT anidado, buscar recursivamente
-                    if right_node.data == "IDENT" and right_node.children:
-                        nested_value = extract_token_value(right_node.children[0])
-                        if nested_value:
-                            right_id = get_node_id(nested_value)
-                            graph.edge(op_id, right_id)
-                            adjacency[id_to_label[op_id]].append(nested_value)
-    
-    elif expr_node.data == "AND" or expr_node.data == "and":
-        # AND: [left, (token AND opcional), right]
-        # Filtrar tokens intermedios y procesar solo expresiones Tree
-        and_id = get_node_id("AND")
-        graph.edge(parent_id, and_id)
-        adjacency[id_to_label[parent_id]].append("AND")
-        
-        # Filtrar solo nodos Tree (ignorar tokens intermedios)
-        tree_children = [ch for ch in expr_node.children if isinstance(ch, Tree)]
-        if len(tree_children) >= 2:
-            left_expr = tree_children[0]
-            right_expr = tree_children[1]
-            _process_boolean_expr(left_expr, and_id, graph, get_node_id, extract_token_value, adjacency, id_to_label)
-            _process_boolean_expr(right_expr, and_id, graph, get_node_id, extract_token_value, adjacency, id_to_label)
-        elif len(tree_children) >= 1:
-            # Si solo hay un hijo Tree, procesarlo
-            _process_boolean_expr(tree_children[0], and_id, graph, get_node_id, extract_token_value, adjacency, id_to_label)
-    
-    elif expr_node.data == "OR" or expr_node.data == "or":
-        # OR: [left, (token OR opcional), right]
-        or_id = get_node_id("OR")
-        graph.edge(parent_id, or_id)
-        adjacency[id_to_label[parent_id]].append("OR")
-        
-        # Filtrar solo nodos Tree
-        tree_children = [ch for ch in expr_node.children if isinstance(ch, Tree)]
-        if len(tree_children) >= 2:
-            left_expr = tree_children[0]
-            right_expr = tree_children[1]
-            _process_boolean_expr(left_expr, or_id, graph, get_node_id, extract_token_value, adjacency, id_to_label)
-            _process_boolean_expr(right_expr, or_id, graph, get_node_id, extract_token_value, adjacency, id_to_label)
-        elif len(tree_children) >= 1:
-            _process_boolean_expr(tree_children[0], or_id, graph, get_node_id, extract_token_value, adjacency, id_to_label)
-    
-    elif expr_node.data == "PARENS":
-        # PARENS: desenvuelve y procesa la expresión interna
-        if expr_node.children:
-            inner_expr = expr_node.children[0]
-            _process_boolean_expr(inner_expr, parent_id, graph, get_node_id, extract_token_value, adjacency, id_to_label)
+def _first_two_trees(children: list) -> Tuple[Tree | None, Tree | None]:
+    """Primeros dos hijos Tree de un nodo, sin construir una lista filtrada."""
+    first = None
+    for ch in children:
+        if isinstance(ch, Tree):
+            if first is not None:
+                return first, ch
+            first = ch
+    return first, None
+
+
+def _process_boolean_expr(expr_node: Tree, parent_id: str, add_child, extract_token_value):
+    """
+    Procesa expresiones booleanas: AND, OR, COMPARE.
+    Recorre la expresión con una pila de (nodo, id_padre) en lugar de recursión,
+    así un WHERE muy anidado no agota la pila de Python.
+    """
+    stack: List[Tuple[Tree, str]] = [(expr_node, parent_id)]
+    dispatch = _BOOL_DISPATCH.get
+    while stack:
+        expr_node, parent_id = stack.pop()
+        if not isinstance(expr_node, Tree):
+            continue
+        emit = dispatch(expr_node.data)
+        if emit is not None:
+            emit(expr_node, parent_id, stack, add_child, extract_token_value)
+
+
+def _operand_value(node, extract_token_value) -> str | None:
+    """Etiqueta de un operando de comparación (IDENT puede venir anidado)."""
+    value = extract_token_value(node)
+    if value is None and isinstance(node, Tree) and node.data == "IDENT" and node.children:
+        value = extract_token_value(node.children[0])
+    return value
+
+
+def _emit_compare(expr_node: Tree, parent_id: str, stack: List[Tuple[Tree, str]],
+                  add_child, extract_token_value):
+    """COMPARE: operador como nodo y sus dos operandos como hijos."""
+    # COMPARE: [OP, left, right]
+    # Estructura: Operator -> Left, Right
+    if len(expr_node.children) >= 3:
+        op_value = extract_token_value(expr_node.children[0])
+        if op_value:
+            op_id = add_child(parent_id, op_value)
+            # Left / Right: IDENT (posiblemente anidado), NUMBER o STRING
+            for operand in expr_node.children[1:3]:
+                value = _operand_value(operand, extract_token_value)
+                if value:
+                    add_child(op_id, value)
+
+
+def _emit_logical(label: str, expr_node: Tree, parent_id: str, stack: List[Tuple[Tree, str]], add_child):
+    """AND/OR: [left, (token opcional), right]; apila los operandos, izquierda arriba."""
+    node_id = add_child(parent_id, label)
+
+    # Solo los dos primeros hijos Tree (se ignoran tokens intermedios)
+    left_expr, right_expr = _first_two_trees(expr_node.children)
+    if right_expr is not None:
+        stack.append((right_expr, node_id))
+    if left_expr is not None:
+        stack.append((left_expr, node_id))
+
+
+def _emit_and(expr_node: Tree, parent_id: str, stack: List[Tuple[Tree, str]], add_child, extract_token_value):
+    _emit_logical("AND", expr_node, parent_id, stack, add_child)
+
+
+def _emit_or(expr_node: Tree, parent_id: str, stack: List[Tuple[Tree, str]], add_child, extract_token_value):
+    _emit_logical("OR", expr_node, parent_id, stack, add_child)
+
+
+def _emit_parens(expr_node: Tree, parent_id: str, stack: List[Tuple[Tree, str]], add_child, extract_token_value):
+    """PARENS: desenvuelve y procesa la expresión interna."""
+    if expr_node.children:
+        stack.append((expr_node.children[0], parent_id))
+
+
+# Manejador por etiqueta de nodo de la expresión booleana. La gramática usa
+# los alias "and"/"or" en minúsculas, así que se registran ambas formas.
+_BOOL_DISPATCH = {
+    "COMPARE": _emit_compare,
+    "AND": _emit_and,
+    "and": _emit_and,
+    "OR": _emit_or,
+    "or": _emit_or,
+    "PARENS": _emit_parens,
+}
+
+
+@lru_cache(maxsize=256)
+def suggest_columns(missing: str, columns: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    Columnas del esquema parecidas a un nombre inexistente (máximo 3).
+    Se memoriza por (nombre, columnas de la tabla): el mismo error se repite
+    en cada re-ejecución de la interfaz mientras el usuario corrige la consulta.
+    """
+    return tuple(difflib.get_close_matches(missing, columns, n=3, cutoff=0.5))
+
+
+# Orden fijo para get_close_matches (RESERVED_KEYWORDS es un set)
+_RESERVED_LIST: Tuple[str, ...] = tuple(sorted(RESERVED_KEYWORDS))
+_MIN_RESERVED_LEN = min(len(k) for k in RESERVED_KEYWORDS)
+_MAX_RESERVED_LEN = max(len(k) for k in RESERVED_KEYWORDS)
+_WORD_RE = re.compile(r"\b[A-Za-z_]+\b")
+_SELECT_PREFIX_RE = re.compile(r"select\b", re.IGNORECASE)
+_LEADING_SPACE_RE = re.compile(r"\s*")
+
+
+def _starts_with_select(sql_text: str) -> bool:
+    """
+    Indica si la sentencia empieza por SELECT tras espacios y comentarios
+    iniciales (-- hasta fin de línea, /* ... */). Se recorren con find en
+    lugar de una expresión regular con repeticiones anidadas, que retrocede
+    de forma exponencial con líneas separadoras del tipo "-- ------".
+    """
+    pos = 0
+    while True:
+        pos = _LEADING_SPACE_RE.match(sql_text, pos).end()
+        if sql_text.startswith("--", pos):
+            pos = sql_text.find("\n", pos)
+        elif sql_text.startswith("/*", pos):
+            pos = sql_text.find("*/", pos + 2)
+            if pos != -1:
+                pos += 2
+        else:
+            return _SELECT_PREFIX_RE.match(sql_text, pos) is not None
+        if pos == -1:
+            return False
+
+
+@lru_cache(maxsize=1024)
+def _closest_reserved(upper: str) -> str | None:
+    """Palabra reservada más parecida a `upper` (ya en mayúsculas), o None."""
+    # Filtro barato por longitud antes de difflib: con más de 2 caracteres de
+    # diferencia respecto a todas las reservadas el par se descartaría igual.
+    if len(upper) - _MAX_RESERVED_LEN > 2 or _MIN_RESERVED_LEN - len(upper) > 2:
+        return None
+    closest = difflib.get_close_matches(upper, _RESERVED_LIST, n=1, cutoff=0.85)
+    if not closest:
+        return None
+    target = closest[0]
+    if abs(len(target) - len(upper)) > 2:
+        return None
+    return target
 
 
 def detect_reserved_keyword_typos(sql_text: str) -> List[Tuple[str, str]]:
@@ -245,26 +341,25 @@ def detect_reserved_keyword_typos(sql_text: str) -> List[Tuple[str, str]]:
     Detecta palabras que son cercanas a palabras reservadas pero están mal escritas.
     Retorna pares (palabra_detectada, palabra_esperada).
     """
-    tokens = re.findall(r"\b[A-Za-z_]+\b", sql_text)
+    tokens = _WORD_RE.findall(sql_text)
     typos: List[Tuple[str, str]] = []
     seen: set[Tuple[str, str]] = set()
-    for raw in tokens:
+    # Cada palabra distinta se evalúa una sola vez, conservando el orden de aparición
+    for raw in dict.fromkeys(tokens):
         upper = raw.upper()
         if upper in RESERVED_KEYWORDS:
             continue
         # Evitar señalar identificadores muy largos o con prefijos comunes
         if len(raw) < 3:
             continue
-        closest = difflib.get_close_matches(upper, list(RESERVED_KEYWORDS), n=1, cutoff=0.85)
-        if closest:
-            target = closest[0]
-            if abs(len(target) - len(upper)) > 2:
-                continue
-            key = (upper, target)
-            if key in seen:
-                continue
-            seen.add(key)
-            typos.append((raw, target))
+        target = _closest_reserved(upper)
+        if target is None:
+            continue
+        key = (upper, target)
+        if key in seen:
+            continue
+        seen.add(key)
+        typos.append((raw, target))
     return typos
 
 
@@ -294,15 +389,86 @@ def build_learning_summary(result: Dict[str, Any]) -> str:
     return " ".join(parts)
 
 
-def analyze(sql_text: str) -> Dict[str, Any]:
+# Módulos de los que depende el resultado de analyze(). Una caché que sobrevive
+# al proceso (la de disco de la UI) debe invalidarse cuando cambia alguno.
+_ANALYZER_FILES: Tuple[str, ...] = tuple(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ("main.py", "lexer.py", "parser_sql.py", "semantic_analyzer.py", "database_simulator.py")
+)
+
+
+def _schema_version() -> int | None:
+    """
+    schema_mtime(), o None si el esquema no se puede leer: analyze() no debe
+    fallar por la clave de caché; la fase semántica ya reporta ese error.
+    """
+    try:
+        return schema_mtime()
+    except OSError:
+        return None
+
+
+def analysis_cache_token() -> Tuple[int | None, ...]:
+    """
+    Fechas de modificación (ns) de los módulos del analizador y de
+    schema_simulado.json (None si no se puede leer). Cambia cuando se edita
+    cualquiera de ellos, así que sirve como parte de la clave de cachés
+    persistentes de analyze().
+    """
+    return tuple(os.stat(path).st_mtime_ns for path in _ANALYZER_FILES) + (_schema_version(),)
+
+
+# Resultados recientes de analyze(), del más antiguo al más reciente
+_ANALYZE_CACHE: "OrderedDict[Tuple[str, bool, bool, int | None], Dict[str, Any]]" = OrderedDict()
+_ANALYZE_CACHE_SIZE = 32
+_ANALYZE_LOCK = threading.Lock()
+
+
+# Longitud máxima del resumen de cada error en "error_previews"
+_ERROR_PREVIEW_CHARS = 80
+
+
+def analyze(sql_text: str, build_graph: bool = True, build_text: bool = True) -> Dict[str, Any]:
+    """
+    Ejecuta el pipeline completo (léxico, sintáctico, semántico y SQLite).
+    build_graph y build_text permiten omitir el grafo Graphviz y la vista
+    textual del AST cuando nadie los va a mostrar (pruebas, uso por lotes);
+    en ese caso "ast_dot" / "ast_text" quedan en None. "ast_dot" es el
+    código DOT del grafo (texto), no el objeto Digraph.
+    Los últimos resultados se memorizan por (texto, build_graph, build_text,
+    mtime de schema_simulado.json): cada llamada recibe una copia superficial
+    del diccionario, pero los DataFrames, el AST y las listas internas se
+    comparten y son de solo lectura. Editar el esquema invalida lo memorizado,
+    igual que en load_schema.
+    """
+    if not sql_text.strip():
+        return _analyze_uncached(sql_text, build_graph, build_text)
+    key = (sql_text, build_graph, build_text, _schema_version())
+    with _ANALYZE_LOCK:
+        cached = _ANALYZE_CACHE.get(key)
+        if cached is not None:
+            _ANALYZE_CACHE.move_to_end(key)
+            return dict(cached)
+    result = _analyze_uncached(sql_text, build_graph, build_text)
+    with _ANALYZE_LOCK:
+        _ANALYZE_CACHE[key] = result
+        if len(_ANALYZE_CACHE) > _ANALYZE_CACHE_SIZE:
+            _ANALYZE_CACHE.popitem(last=False)
+    return dict(result)
+
+
+def _analyze_uncached(sql_text: str, build_graph: bool, build_text: bool) -> Dict[str, Any]:
+    import pandas as pd
+
     result: Dict[str, Any] = {
         "tokens_df": None,
         "ast": None,
-        "ast_graph": None,
+        "ast_dot": None,
         "ast_text": None,
         "symbols_df": None,
         "types_df": None,
         "errors": [],
+        "error_previews": [],
         "hints": [],
         "error_snippet": None,
         "phase": "",
@@ -314,52 +480,72 @@ def analyze(sql_text: str) -> Dict[str, Any]:
 
     def finalize() -> Dict[str, Any]:
         result["learning_summary"] = build_learning_summary(result)
+        # Títulos de los expanders de la UI, calculados una vez por análisis
+        result["error_previews"] = [
+            e[:_ERROR_PREVIEW_CHARS] + "..." if len(e) > _ERROR_PREVIEW_CHARS else e
+            for e in result["errors"]
+        ]
         return result
 
+    # Mensajes de palabras reservadas mal escritas ya agregados: pueden
+    # repetirse entre la fase léxica y la sintáctica
+    errors_seen: set = set()
+    hints_seen: set = set()
+
+    def add_error(msg: str) -> None:
+        if msg not in errors_seen:
+            errors_seen.add(msg)
+            result["errors"].append(msg)
+
+    def add_hint(msg: str) -> None:
+        if msg not in hints_seen:
+            hints_seen.add(msg)
+            result["hints"].append(msg)
+
     stripped_sql = sql_text.strip()
-    if stripped_sql:
+    typo_pairs_cached = detect_reserved_keyword_typos(sql_text) if stripped_sql else []
+
+    # Fase Léxica: En un compilador real, siempre genera tokens (incluso con errores parciales)
+    # Si la consulta es válida, el árbol de derivación ya contiene todos los
+    # tokens: se toman de ahí y el sintáctico reutiliza ese mismo parseo (memorizado).
+    # Solo si el parseo falla se ejecuta el léxico por separado.
+    try:
+        parse_tree = parse_sql_tree(sql_text)
+    except Exception:
+        parse_tree = None
+
+    # SQLite solo recibe consultas que empiezan por SELECT y que no fallaron al
+    # parsear por palabras reservadas mal escritas: las demás fallarían igual.
+    # Las palabras parecidas a reservadas en literales o alias no bloquean nada.
+    if not stripped_sql:
+        result["db_error"] = None
+    elif typo_pairs_cached and parse_tree is None:
+        result["db_error"] = "la consulta no se envió a SQLite porque contiene palabras reservadas mal escritas."
+    elif not _starts_with_select(sql_text):
+        result["db_error"] = "la consulta no se envió a SQLite: solo se ejecutan sentencias SELECT."
+    else:
         db_df, db_error = execute_demo_query(sql_text)
         if db_df is not None:
             result["db_result_df"] = db_df
         if db_error:
             result["db_error"] = db_error
-    else:
-        result["db_error"] = None
-
-    typo_pairs_cached = detect_reserved_keyword_typos(sql_text) if stripped_sql else []
 
-    # Fase Léxica: En un compilador real, siempre genera tokens (incluso con errores parciales)
     tokens = []
     lex_errors = []
     try:
-        tokens = lex_sql(sql_text)
+        tokens = tokens_from_tree(parse_tree) if parse_tree is not None else lex_sql(sql_text)
         if not tokens:
             lex_errors.append("No se generaron tokens. Revisa la entrada SQL.")
     except Exception as ex:
         error_msg = str(ex)
         lex_errors.append(f"Error léxico: {error_msg}")
-        # Intentar generar tokens parciales si es posible
-        try:
-            # En un compilador real, el léxico intenta generar tokens hasta donde puede
-            # Intentar tokenizar con manejo de errores más robusto
-            from parser_sql import build_parser
-            parser = build_parser()
-            # Intentar tokenizar hasta el primer error
-            partial_text = sql_text.strip()
-            if partial_text:
-                try:
-                    # Intentar obtener al menos algunos tokens
-                    tokens = list(parser.lex(partial_text))
-                except Exception:
-                    # Si falla, intentar con una versión truncada
-                    pass
-        except Exception:
-            pass
+        # lex_sql ya intenta recuperar los tokens previos al error con el parser
+        # memorizado; si aun así lanza, no hubo tokens que recuperar.
     
     # Mostrar tokens generados (incluso si hay errores)
     if tokens:
-        lex_rows = tokens_to_table(tokens)
-        tokens_df = pd.DataFrame([r.__dict__ for r in lex_rows])
+        lex_cols = tokens_to_table(tokens)
+        tokens_df = pd.DataFrame(lex_cols, copy=False)
         result["tokens_df"] = tokens_df
         result["metrics"]["tokens"] = len(tokens_df)
     else:
@@ -369,12 +555,8 @@ def analyze(sql_text: str) -> Dict[str, Any]:
     result["errors"].extend(lex_errors)
     if lex_errors:
         for wrong, expected in typo_pairs_cached:
-            msg = f"Palabra reservada mal escrita: '{wrong}' → se esperaba '{expected}'."
-            if msg not in result["errors"]:
-                result["errors"].append(msg)
-            hint_msg = f"Corregir a '{expected}' en lugar de '{wrong}'."
-            if hint_msg not in result["hints"]:
-                result["hints"].append(hint_msg)
+            add_error(f"Palabra reservada mal escrita: '{wrong}' → se esperaba '{expected}'.")
+            add_hint(f"Corregir a '{expected}' en lugar de '{wrong}'.")
     result["phase"] = "léxica"
     
     # Si no hay tokens y hay errores críticos, intentar continuar de todas formas si hay algo de texto
@@ -385,7 +567,10 @@ def analyze(sql_text: str) -> Dict[str, Any]:
     # En un compilador real, el sintáctico opera sobre la salida del léxico
     # Intentar construir AST incluso si hay errores léxicos (si hay tokens)
     try:
-        # Si hay tokens, intentar parsear
+        # Si hay tokens, intentar parsear. El AST se memoriza por texto y se
+        # construye sobre el mismo árbol de derivación memorizado que dio los
+        # tokens, así que no se vuelve a parsear; al ser el mismo objeto en cada
+        # llamada, también se reutiliza el análisis semántico guardado en él.
         if tokens:
             ast = parse_sql_to_ast(sql_text, tokens=tokens)
         else:
@@ -393,9 +578,10 @@ def analyze(sql_text: str) -> Dict[str, Any]:
             # (el parser internamente re-lexica)
             ast = parse_sql_to_ast(sql_text, tokens=None)
         result["ast"] = ast
-        ast_graph, node_labels, ast_text = ast_to_graphviz(ast)
-        result["ast_graph"] = ast_graph
-        result["ast_text"] = ast_text
+        ast_graph, node_labels, ast_text = ast_to_graphviz(ast, build_graph=build_graph, build_text=build_text)
+        # Solo se guarda el DOT: es lo que consume la UI y se serializa mejor que el Digraph
+        result["ast_dot"] = ast_graph.source if ast_graph is not None else None
+        result["ast_text"] = ast_text if build_text else None
         result["metrics"]["ast_nodes"] = len(node_labels)
         result["phase"] = "sintáctica"
     except UnexpectedInput as ex:
@@ -412,22 +598,9 @@ def analyze(sql_text: str) -> Dict[str, Any]:
             except Exception:
                 result["error_snippet"] = sql_text[max(0, column-20):column+20] if column else sql_text
             # Sugerencias didácticas básicas según tokens esperados
-            expected = set()
-            try:
-                expected = set(ex.expected) if hasattr(ex, 'expected') else set()
-            except Exception:
-                expected = set()
-            hints: List[str] = []
-            if "FROM" in expected:
-                hints.append("Agrega la cláusula FROM: FROM <tabla>")
-            if "COMMA" in expected:
-                hints.append("Puede faltar una coma entre columnas, por ejemplo: SELECT col1, col2")
-            if "AS" in expected:
-                hints.append("Si estás usando alias, utiliza AS: SELECT col AS alias")
-            if "LPAREN" in expected or "RPAREN" in expected:
-                hints.append("Revisa paréntesis balanceados en la expresión WHERE")
-            if "EQ" in expected or "NEQ" in expected or "LT" in expected or "LTE" in expected or "GT" in expected or "GTE" in expected:
-                hints.append("Falta un operador de comparación: =, !=, <>, <, <=, >, >=")
+            # UnexpectedToken ya trae un set; UnexpectedCharacters no define expected
+            expected = getattr(ex, "expected", None) or frozenset()
+            hints: List[str] = [msg for trigger, msg in HINT_RULES if not trigger.isdisjoint(expected)]
             if not hints and expected:
                 hints.append(f"Se esperaba uno de estos elementos: {', '.join(list(expected)[:5])}")
             if hints:
@@ -436,12 +609,8 @@ def analyze(sql_text: str) -> Dict[str, Any]:
             result["errors"].append(f"Error sintáctico: {error_msg}")
         result["phase"] = "sintáctica"
         for wrong, expected in typo_pairs_cached:
-            msg = f"Palabra reservada mal escrita: '{wrong}' → se esperaba '{expected}'."
-            if msg not in result["errors"]:
-                result["errors"].append(msg)
-            hint_msg = f"Corregir a '{expected}' en lugar de '{wrong}'."
-            if hint_msg not in result["hints"]:
-                result["hints"].append(hint_msg)
+            add_error(f"Palabra reservada mal escrita: '{wrong}' → se esperaba '{expected}'.")
+            add_hint(f"Corregir a '{expected}' en lugar de '{wrong}'.")
         # En un compilador real, aún intentaríamos construir AST parcial
         # Por ahora, retornamos sin AST si hay error sintáctico crítico
         return finalize()
@@ -455,34 +624,27 @@ def analyze(sql_text: str) -> Dict[str, Any]:
     try:
         schema = load_schema()
         symbols, type_rows, sem_errors = analyze_semantics(result["ast"], schema)
-        # Convertir símbolos a DataFrame con todas las columnas del dataclass
-        symbols_dicts: List[Dict[str, Any]] = []
-        for s in symbols:
-            sym_dict = {
-                "Nombre": s.name,
-                "Tipo": s.type,
-                "Ámbito": s.scope,
-                "Categoría": getattr(s, "kind", "variable"),
-                "Tamaño": getattr(s, "size", 0) or "-",
-                "Offset": getattr(s, "offset", 0) or "-",
-            }
-            symbols_dicts.append(sym_dict)
-        symbols_df = pd.DataFrame(symbols_dicts)
+        # Convertir símbolos a DataFrame por columnas con todos los campos del dataclass
+        symbols_df = pd.DataFrame({
+            "Nombre": [s.name for s in symbols],
+            "Tipo": [s.type for s in symbols],
+            "Ámbito": [s.scope for s in symbols],
+            "Categoría": [getattr(s, "kind", "variable") for s in symbols],
+            "Tamaño": [getattr(s, "size", 0) or "-" for s in symbols],
+            "Offset": [getattr(s, "offset", 0) or "-" for s in symbols],
+        }, copy=False)
         result["symbols_df"] = symbols_df
 
-        pretty_types: List[Dict[str, Any]] = []
-        for row in type_rows:
-            pretty_types.append({
-                "Nombre": row.get("nombre"),
-                "Tipo": row.get("tipo"),
-                "Tamaño": row.get("tamano"),
-                "Tabla": row.get("tabla"),
-                "Ámbito": row.get("ambito"),
-                "Alias": row.get("alias", "-"),
-            })
-        result["types_df"] = pd.DataFrame(pretty_types)
+        result["types_df"] = pd.DataFrame({
+            "Nombre": type_rows.nombres,
+            "Tipo": type_rows.tipos,
+            "Tamaño": type_rows.tamanos,
+            "Tabla": type_rows.tablas,
+            "Ámbito": type_rows.ambitos,
+            "Alias": type_rows.aliases,
+        }, copy=False)
         result["errors"].extend(sem_errors)
-        result["metrics"]["symbols"] = len(symbols_dicts)
+        result["metrics"]["symbols"] = len(symbols)
         # Sugerencias semánticas
         if sem_errors:
             tables = list(schema.get("tables", {}).keys())
@@ -492,15 +654,13 @@ def analyze(sql_text: str) -> Dict[str, Any]:
                 if err.startswith("Columna inexistente en SELECT:") or err.startswith("Columna inexistente en WHERE:"):
                     # ofrecer columnas similares
                     missing = err.split(":",1)[1].strip()
-                    # intentar detectar tabla usada
-                    table_used = None
-                    try:
-                        table_used = result["symbols_df"]["Ámbito"].iloc[0].split(".")[-1]
-                    except Exception:
+                    # intentar detectar tabla usada (el símbolo de categoría "table")
+                    table_used = next((s.name for s in symbols if s.kind == "table"), None)
+                    if table_used is None:
                         table_used = tables[0] if tables else None
                     if table_used and table_used in schema.get("tables", {}):
-                        cols = list(schema["tables"][table_used].keys())
-                        close = difflib.get_close_matches(missing, cols, n=3, cutoff=0.5)
+                        cols = tuple(schema["tables"][table_used].keys())
+                        close = suggest_columns(missing, cols)
                         if close:
                             result["hints"].append(f"¿Querías referirte a: {', '.join(close)}?")
                         else:
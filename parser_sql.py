@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from lark import Lark, Transformer, Tree, Token, UnexpectedInput
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 
 SQL_GRAMMAR = r"""
@@ -146,20 +147,54 @@ class ASTBuilder(Transformer):
         return Tree("OP", [items[0]])
 
 
+@lru_cache(maxsize=1)
 def build_parser() -> Lark:
-    return Lark(SQL_GRAMMAR, start="start", parser="lalr", propagate_positions=True, maybe_placeholders=False)
+    """
+    Devuelve el parser LALR de la gramática, construido una sola vez por proceso.
+    cache=True guarda además las tablas LALR en el directorio temporal, de modo
+    que un proceso nuevo (p. ej. al reiniciar Streamlit) no recompila la gramática.
+    """
+    return Lark(SQL_GRAMMAR, start="start", parser="lalr", propagate_positions=True, maybe_placeholders=False, cache=True)
 
 
-def parse_sql_to_ast(sql_text: str, tokens: Optional[List[Token]] = None) -> Tree:
+def parse_sql_to_ast(sql_text: str, tokens: Optional[List[Token]] = None, pre_parsed: Optional[Tree] = None) -> Tree:
     """
     Parsea SQL a AST. Si se proporcionan tokens del léxico, conceptualmente
     el sintáctico se construye sobre la salida del léxico.
     En Lark, internamente re-lexica, pero guardamos los tokens para referencia.
+    Sin pre_parsed, el resultado se memoriza por texto SQL (y se construye
+    sobre el árbol memorizado de parse_sql_tree): el AST devuelto se comparte
+    entre llamadas con la misma entrada y no debe modificarse.
+    Con pre_parsed (un árbol de derivación ya obtenido) solo se aplica
+    ASTBuilder, sin memorizar: cada llamada devuelve un AST nuevo.
     """
-    parser = build_parser()
-    parsed = parser.parse(sql_text)
-    ast = ASTBuilder().transform(parsed)
-    return ast
+    if pre_parsed is not None:
+        return ASTBuilder().transform(pre_parsed)
+    return _parse_sql_cached(sql_text)
+
+
+@lru_cache(maxsize=64)
+def _parse_sql_cached(sql_text: str) -> Tree:
+    return ASTBuilder().transform(parse_sql_tree(sql_text))
+
+
+def parse_sql_tree(sql_text: str) -> Tree:
+    """
+    Árbol de derivación de Lark (antes de ASTBuilder), memorizado por texto SQL.
+    Conserva todos los tokens de la entrada, por lo que también sirve como
+    salida del léxico cuando la consulta es válida (ver tokens_from_tree).
+    """
+    return _parse_tree_cached(sql_text)
+
+
+@lru_cache(maxsize=64)
+def _parse_tree_cached(sql_text: str) -> Tree:
+    return build_parser().parse(sql_text)
+
+
+def tokens_from_tree(tree: Tree) -> list[Token]:
+    """Tokens de un árbol de derivación en orden de aparición."""
+    return list(tree.scan_values(lambda v: isinstance(v, Token)))
 
 
 def lex_sql(sql_text: str) -> list[Token]:
@@ -167,7 +202,13 @@ def lex_sql(sql_text: str) -> list[Token]:
     Analiza léxicamente el texto SQL y genera tokens.
     En un compilador real, esta fase siempre genera tokens (incluso con errores parciales).
     Si hay un error léxico, intenta generar tokens hasta donde sea posible.
+    Los tokens se memorizan por texto SQL; cada llamada recibe su propia lista.
     """
+    return list(_lex_sql_cached(sql_text))
+
+
+@lru_cache(maxsize=64)
+def _lex_sql_cached(sql_text: str) -> Tuple[Token, ...]:
     parser = build_parser()
     tokens = []
     try:
@@ -200,7 +241,7 @@ def lex_sql(sql_text: str) -> list[Token]:
             pass
         if not tokens:
             raise e
-    return tokens
+    return tuple(tokens)
 
 
 
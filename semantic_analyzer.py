@@ -1,14 +1,16 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+import os
+import sys
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional
 
 from lark import Tree, Token
 
 
-@dataclass
+@dataclass(slots=True)
 class Symbol:
     name: str
     type: str
@@ -19,9 +21,116 @@ class Symbol:
     offset: int = 0  # Offset en memoria (para compiladores reales)
 
 
+# Esquemas ya cargados: ruta -> (mtime_ns, esquema). Se vuelve a leer el
+# archivo solo cuando cambia su fecha de modificación.
+_SCHEMA_CACHE: Dict[str, Tuple[int, Dict]] = {}
+
+
+def schema_mtime(path: str | Path = "schema_simulado.json") -> int:
+    """Fecha de modificación (ns) del esquema; sirve de clave para cachés que dependen de él."""
+    return os.stat(Path(path).resolve()).st_mtime_ns
+
+
 def load_schema(path: str | Path = "schema_simulado.json") -> Dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    key = str(Path(path).resolve())
+    mtime = os.stat(key).st_mtime_ns
+    cached = _SCHEMA_CACHE.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(key, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    _SCHEMA_CACHE[key] = (mtime, schema)
+    return schema
+
+
+@dataclass(slots=True)
+class TypesTable:
+    """
+    Tabla de tipos por columnas (una lista por campo) en lugar de un dict por
+    fila: cada columna del SELECT añade un valor a cada lista.
+    """
+    nombres: List[str] = field(default_factory=list)
+    tipos: List[str] = field(default_factory=list)
+    tamanos: List[str] = field(default_factory=list)
+    tablas: List[str] = field(default_factory=list)
+    ambitos: List[str] = field(default_factory=list)
+    aliases: List[str] = field(default_factory=list)
+
+    def append(self, nombre: str, tipo: str, tamano: str, tabla: str, ambito: str, alias: str = "-") -> None:
+        self.nombres.append(nombre)
+        self.tipos.append(tipo)
+        self.tamanos.append(tamano)
+        self.tablas.append(tabla)
+        self.ambitos.append(ambito)
+        self.aliases.append(alias)
+
+    def __len__(self) -> int:
+        return len(self.nombres)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        # Filas (nombre, tipo, tamano, tabla, ambito, alias) generadas de una en
+        # una: un recorrido único no materializa la lista completa de dicts
+        for n, t, sz, tb, a, al in zip(self.nombres, self.tipos, self.tamanos, self.tablas, self.ambitos, self.aliases):
+            yield {"nombre": n, "tipo": t, "tamano": sz, "tabla": tb, "ambito": a, "alias": al}
+
+    @property
+    def rows(self) -> List[Dict[str, str]]:
+        """Vista por filas como lista, para quien necesite len() o índices."""
+        return list(self)
+
+
+@dataclass(slots=True)
+class SchemaIndex:
+    """Vista precalculada de un esquema para las búsquedas del análisis semántico."""
+    schema: Dict
+    table_keys: frozenset
+    # tabla -> columna -> (tipo, tamaño, tamaño como texto para la tabla de tipos)
+    meta: Dict[str, Dict[str, Tuple[str, int, str]]]
+    # tabla -> (columna, tipo, tamaño, tamaño como texto) en el orden del esquema (SELECT *)
+    entries: Dict[str, Tuple[Tuple[str, str, int, str], ...]]
+    # tabla -> (ámbito SELECT, ámbito WHERE), internados
+    scopes: Dict[str, Tuple[str, str]]
+
+
+# Último índice construido. load_schema devuelve siempre el mismo dict mientras
+# el archivo no cambie, así que basta con comparar la identidad del esquema.
+# (Los dict no admiten weakref, por eso no se usa un WeakKeyDictionary.)
+_LAST_SCHEMA_INDEX: Optional[SchemaIndex] = None
+
+
+def _schema_index(schema: Dict) -> SchemaIndex:
+    global _LAST_SCHEMA_INDEX
+    index = _LAST_SCHEMA_INDEX
+    if index is not None and index.schema is schema:
+        return index
+    tables = schema.get("tables", {})
+    # Nombres y tipos internados: se repiten en cada símbolo y fila de tipos
+    intern = sys.intern
+    meta: Dict[str, Dict[str, Tuple[str, int, str]]] = {}
+    for table, columns in tables.items():
+        table_meta = meta[intern(table)] = {}
+        for col, col_meta in columns.items():
+            size = col_meta.get("size", 0)
+            table_meta[intern(col)] = (intern(col_meta.get("type", "UNKNOWN")), size, str(size or "-"))
+    entries = {
+        table: tuple((col, col_type, size, size_text) for col, (col_type, size, size_text) in table_meta.items())
+        for table, table_meta in meta.items()
+    }
+    scopes = {table: (intern(f"{table}.SELECT"), intern(f"{table}.WHERE")) for table in meta}
+    index = SchemaIndex(schema=schema, table_keys=frozenset(meta), meta=meta, entries=entries, scopes=scopes)
+    _LAST_SCHEMA_INDEX = index
+    return index
+
+
+# Valores fijos de la tabla de símbolos, compartidos por todos los análisis
+_TABLE_TYPE = sys.intern("TABLE")
+_GLOBAL_SCOPE = sys.intern("GLOBAL")
+_KIND_TABLE = sys.intern("table")
+_KIND_COLUMN = sys.intern("column")
+
+
+# Nodos del AST cuyo texto es el de su token hijo
+_TEXT_NODES = frozenset({"IDENT", "NUMBER", "STRING"})
 
 
 def _token_text(node) -> str:
@@ -29,183 +138,210 @@ def _token_text(node) -> str:
         return str(node)
     if isinstance(node, Tree):
         # IDENT -> [Token(CNAME, ...)]
-        if node.data in {"IDENT", "NUMBER", "STRING"} and node.children:
-            return _token_text(node.children[0])
+        if node.data in _TEXT_NODES and node.children:
+            # Los AST se memorizan y comparten entre análisis: el texto se
+            # guarda en el propio nodo la primera vez que se calcula
+            cached = getattr(node, "_cached_text", None)
+            if cached is None:
+                # Desenvuelve IDENT(IDENT(token)) con un bucle en vez de recursión
+                inner = node.children[0]
+                while isinstance(inner, Tree) and inner.data in _TEXT_NODES and inner.children:
+                    inner = inner.children[0]
+                cached = node._cached_text = str(inner)
+            return cached
     return str(node)
 
 
-def _collect_columns_from_select(ast: Tree) -> List[Tuple[str, Optional[str]]]:
-    # Devuelve lista de (colname, alias)
+def _columns_of(column_list: Tree) -> Tuple[bool, List[Tuple[str, Optional[str]]]]:
+    # Devuelve (hay STAR, lista de (colname, alias))
+    star = False
     cols: List[Tuple[str, Optional[str]]] = []
-    def visit(node: Tree):
-        if isinstance(node, Tree) and node.data == "COLUMN_LIST":
-            for child in node.children:
-                if isinstance(child, Tree) and child.data == "STAR":
-                    cols.append(("*", None))
-                elif isinstance(child, Tree) and child.data == "COLUMN":
-                    ident = _token_text(child.children[0])
-                    alias = None
-                    if len(child.children) == 2 and isinstance(child.children[1], Tree) and child.children[1].data == "ALIAS":
-                        alias = _token_text(child.children[1].children[0])
-                    cols.append((ident, alias))
-        else:
-            for ch in getattr(node, "children", []):
-                if isinstance(ch, Tree):
-                    visit(ch)
-    visit(ast)
-    return cols
-
-
-def _get_table_name(ast: Tree) -> Optional[str]:
-    # Intento directo según estructura del AST construido
-    if isinstance(ast, Tree) and ast.data == "SELECT_NODE" and len(ast.children) >= 2:
-        table_node = ast.children[1]
-        if isinstance(table_node, Tree) and table_node.data == "TABLE" and table_node.children:
-            return _token_text(table_node.children[0])
-
-    # Búsqueda recursiva: SOLO nodos TABLE
-    def visit(node: Tree) -> Optional[str]:
-        if isinstance(node, Tree) and node.data == "TABLE" and node.children:
-            return _token_text(node.children[0])
-        for ch in getattr(node, "children", []):
-            if isinstance(ch, Tree):
-                r = visit(ch)
-                if r:
-                    return r
-        return None
-    return visit(ast)
-
-
-def _collect_identifiers_in_where(ast: Tree) -> List[str]:
+    for child in column_list.children:
+        if isinstance(child, Tree) and child.data == "STAR":
+            star = True
+        elif isinstance(child, Tree) and child.data == "COLUMN":
+            ident = _token_text(child.children[0])
+            alias = None
+            if len(child.children) == 2 and isinstance(child.children[1], Tree) and child.children[1].data == "ALIAS":
+                alias = _token_text(child.children[1].children[0])
+            cols.append((ident, alias))
+    return star, cols
+
+
+def _idents_in(node: Tree) -> List[str]:
+    # Identificadores de una expresión en preorden, con pila explícita
     idents: List[str] = []
-    def visit(node: Tree):
-        if isinstance(node, Tree) and node.data == "WHERE_CLAUSE":
-            def walk(n: Tree):
-                if isinstance(n, Tree) and n.data == "IDENT":
-                    idents.append(_token_text(n.children[0]))
-                for c in getattr(n, "children", []):
-                    if isinstance(c, Tree):
-                        walk(c)
-            walk(node)
-        else:
-            for ch in getattr(node, "children", []):
-                if isinstance(ch, Tree):
-                    visit(ch)
-    visit(ast)
+    stack: List[Tree] = [node]
+    while stack:
+        n = stack.pop()
+        if n.data == "IDENT":
+            # IDENT solo envuelve su token (o un IDENT anidado en las
+            # comparaciones): se toma el texto sin descender, así no se cuenta dos veces
+            if n.children:
+                idents.append(_token_text(n.children[0]))
+            continue
+        stack.extend(c for c in reversed(n.children) if isinstance(c, Tree))
     return idents
 
 
-def analyze_semantics(ast: Tree, schema: Dict) -> Tuple[List[Symbol], List[Dict[str, str]], List[str]]:
+def _walk(ast: Tree) -> Tuple[Optional[str], bool, List[Tuple[str, Optional[str]]], List[str]]:
+    """
+    Recorre el AST una sola vez y devuelve (tabla, SELECT *,
+    columnas del SELECT como (colname, alias), identificadores del WHERE).
+    """
+    # Forma que produce ASTBuilder: SELECT_NODE[COLUMN_LIST, TABLE, WHERE_CLAUSE?]
+    match ast:
+        case Tree(data="SELECT_NODE", children=[Tree(data="COLUMN_LIST") as columns,
+                                                  Tree(data="TABLE", children=[table_ref, *_]), *rest]):
+            where_idents = _idents_in(rest[0]) if rest and isinstance(rest[0], Tree) else []
+            star, cols = _columns_of(columns)
+            return _token_text(table_ref), star, cols, where_idents
+
+    # Cualquier otra forma: búsqueda general con pila explícita
+    table_name: Optional[str] = None
+    star = False
+    cols: List[Tuple[str, Optional[str]]] = []
+    idents: List[str] = []
+    stack: List[Tree] = [ast]
+    while stack:
+        node = stack.pop()
+        data = node.data
+        if data == "TABLE":
+            if table_name is None and node.children:
+                table_name = _token_text(node.children[0])
+            continue
+        if data == "COLUMN_LIST":
+            node_star, node_cols = _columns_of(node)
+            star = star or node_star
+            cols.extend(node_cols)
+            continue
+        if data == "WHERE_CLAUSE":
+            idents.extend(_idents_in(node))
+            continue
+        stack.extend(c for c in reversed(node.children) if isinstance(c, Tree))
+    return table_name, star, cols, idents
+
+
+def analyze_semantics(ast: Tree, schema: Dict) -> Tuple[List[Symbol], TypesTable, List[str]]:
     """
     Retorna (symbol_table, type_table, errors)
     - symbol_table: lista de símbolos (nombre, tipo, ámbito)
-    - type_table: lista con info de columnas (columna, tipo, tamaño)
+    - type_table: TypesTable con info de columnas (columna, tipo, tamaño);
+      iterarla produce las filas como dicts
     - errors: lista de mensajes de error
+    El resultado se guarda en el propio nodo raíz junto con el índice del
+    esquema usado: los AST se memorizan por texto SQL, así que repetir la
+    misma consulta con el mismo esquema no vuelve a analizarla. Las listas
+    devueltas son copias; la TypesTable se comparte y es de solo lectura.
+    """
+    return _analyze_cached(ast, _schema_index(schema))
+
+
+def analyze_many(asts: List[Tree], schema: Dict) -> List[Tuple[List[Symbol], TypesTable, List[str]]]:
     """
+    analyze_semantics para varias consultas contra el mismo esquema: el índice
+    del esquema se resuelve una sola vez para todo el lote. Devuelve un
+    resultado (symbol_table, type_table, errors) por AST, en el mismo orden.
+    """
+    index = _schema_index(schema)
+    return [_analyze_cached(ast, index) for ast in asts]
+
+
+def _analyze_cached(ast: Tree, index: SchemaIndex) -> Tuple[List[Symbol], TypesTable, List[str]]:
+    if not isinstance(ast, Tree):
+        return _analyze(ast, index)
+    cached = getattr(ast, "_semantic_result", None)
+    if cached is None or cached[0] is not index:
+        cached = ast._semantic_result = (index, _analyze(ast, index))
+    symbols, types_rows, errors = cached[1]
+    return list(symbols), types_rows, list(errors)
+
+
+def _analyze(ast: Tree, index: SchemaIndex) -> Tuple[List[Symbol], TypesTable, List[str]]:
     errors: List[str] = []
     symbols: List[Symbol] = []
-    types_rows: List[Dict[str, str]] = []
+    types_rows = TypesTable()
 
-    tables = schema.get("tables", {})
-
-    table_name = _get_table_name(ast)
+    table_name, star, select_cols, where_idents = _walk(ast) if isinstance(ast, Tree) else (None, False, [], [])
     if not table_name:
-        # Fallback: buscar IDENT que coincida con tablas del esquema
-        table_keys = set(schema.get("tables", {}).keys())
+        # Fallback: buscar IDENT que coincida con tablas del esquema (preorden,
+        # con pila explícita; se detiene en la primera coincidencia)
+        table_keys = index.table_keys
         found: Optional[str] = None
-        def visit_ident(n: Tree):
-            nonlocal found
-            if found is not None:
-                return
-            if isinstance(n, Tree) and n.data == "IDENT" and n.children:
+        stack = [ast] if isinstance(ast, Tree) else []
+        while stack:
+            n = stack.pop()
+            if n.data == "IDENT" and n.children:
                 text = _token_text(n.children[0])
                 if text in table_keys:
                     found = text
-                    return
-            for c in getattr(n, "children", []):
-                if isinstance(c, Tree):
-                    visit_ident(c)
-        visit_ident(ast)
+                    break
+            stack.extend(c for c in reversed(n.children) if isinstance(c, Tree))
         table_name = found
     if not table_name:
         errors.append("No se encontró la tabla en el AST")
         return symbols, types_rows, errors
 
-    if table_name not in tables:
+    if table_name not in index.table_keys:
         errors.append(f"Tabla inexistente: {table_name}")
         return symbols, types_rows, errors
 
-    columns_def = tables[table_name]
+    columns_def = index.meta[table_name]
 
     # Tabla de símbolos como en compilador real:
     # Primero añadir la tabla misma
-    symbols.append(Symbol(name=table_name, type="TABLE", scope="GLOBAL", kind="table"))
+    symbols.append(Symbol(name=table_name, type=_TABLE_TYPE, scope=_GLOBAL_SCOPE, kind=_KIND_TABLE))
+
+    select_scope, where_scope = index.scopes[table_name]
     
     # Columnas en SELECT
-    select_cols = _collect_columns_from_select(ast)
-    if select_cols and select_cols[0][0] == "*":
+    if star:
         # Expandir todas las columnas
-        for col, meta in columns_def.items():
-            col_type = meta.get("type", "UNKNOWN")
-            size = meta.get("size", 0)
+        for col, col_type, size, size_text in index.entries[table_name]:
             symbols.append(Symbol(
                 name=col, 
                 type=col_type, 
-                scope=f"{table_name}.SELECT", 
-                kind="column",
+                scope=select_scope, 
+                kind=_KIND_COLUMN,
                 size=size
             ))
-            types_rows.append({
-                "nombre": col, 
-                "tipo": col_type, 
-                "tamano": str(size or "-"),
-                "tabla": table_name,
-                "ambito": f"{table_name}.SELECT"
-            })
+            types_rows.append(col, col_type, size_text, table_name, select_scope)
     else:
+        # Columnas inexistentes primero (en orden), luego solo las válidas
+        errors.extend([f"Columna inexistente en SELECT: {col}" for col, _ in select_cols if col not in columns_def])
         for col, alias in select_cols:
-            if col not in columns_def:
-                errors.append(f"Columna inexistente en SELECT: {col}")
+            meta = columns_def.get(col)
+            if meta is None:
                 continue
-            meta = columns_def[col]
-            col_type = meta.get("type", "UNKNOWN")
-            size = meta.get("size", 0)
+            col_type, size, size_text = meta
             symbol_name = alias or col
             symbols.append(Symbol(
                 name=symbol_name, 
                 type=col_type, 
-                scope=f"{table_name}.SELECT", 
-                kind="column",
+                scope=select_scope, 
+                kind=_KIND_COLUMN,
                 size=size
             ))
-            types_rows.append({
-                "nombre": col, 
-                "tipo": col_type, 
-                "tamano": str(size or "-"),
-                "tabla": table_name,
-                "ambito": f"{table_name}.SELECT",
-                "alias": alias if alias else "-"
-            })
+            types_rows.append(col, col_type, size_text, table_name, select_scope, alias if alias else "-")
 
     # Identificadores en WHERE: añadir a tabla de símbolos si existen
-    where_idents = _collect_identifiers_in_where(ast)
+    # Solo los símbolos de WHERE tienen where_scope, así que basta con
+    # recordar qué nombres se añadieron en este bucle
+    where_seen: set = set()
     for ident in where_idents:
         if ident not in columns_def:
             errors.append(f"Columna inexistente en WHERE: {ident}")
-        else:
-            # Añadir símbolo para WHERE si no existe ya
-            meta = columns_def[ident]
-            col_type = meta.get("type", "UNKNOWN")
-            size = meta.get("size", 0)
-            # Solo añadir si no está ya en símbolos (evitar duplicados)
-            if not any(s.name == ident and s.scope == f"{table_name}.WHERE" for s in symbols):
-                symbols.append(Symbol(
-                    name=ident,
-                    type=col_type,
-                    scope=f"{table_name}.WHERE",
-                    kind="column",
-                    size=size
-                ))
+        elif ident not in where_seen:
+            # Añadir símbolo para WHERE si no existe ya (evitar duplicados)
+            where_seen.add(ident)
+            col_type, size, _ = columns_def[ident]
+            symbols.append(Symbol(
+                name=ident,
+                type=col_type,
+                scope=where_scope,
+                kind=_KIND_COLUMN,
+                size=size
+            ))
 
     return symbols, types_rows, errors
 
@@ -49,3 +49,179 @@ def test_smoke():
             # No exigimos cero errores en todos los casos, pero sí que sea una lista
             assert isinstance(errors, list)
 
+
+
+def test_demo_db_aislada_entre_consultas():
+    """Cada consulta trabaja sobre una copia nueva de la base de ejemplo."""
+    from database_simulator import execute_demo_query
+
+    execute_demo_query("DELETE FROM students;")
+    df, err = execute_demo_query("SELECT id FROM students;")
+    assert err is None
+    assert len(df) == 5
+
+
+def test_ast_text_con_and_encadenados():
+    """Cada nodo del AST es propio aunque la etiqueta se repita (AND, age, id)."""
+    import re
+    from main import analyze
+
+    result = analyze("SELECT id FROM students WHERE age > 1 AND age < 30 AND id = 2;")
+    assert result["ast_text"] == "\n".join([
+        "SELECT",
+        "  id",
+        "  FROM",
+        "    students",
+        "  WHERE",
+        "    AND",
+        "      AND",
+        "        >",
+        "          age",
+        "          1",
+        "        <",
+        "          age",
+        "          30",
+        "      =",
+        "        id",
+        "        2",
+    ])
+    edges = re.findall(r"(n\d+) -> (n\d+)", result["ast_dot"])
+    assert edges and all(tail != head for tail, head in edges)
+    # Árbol: cada nodo salvo la raíz tiene exactamente un padre
+    heads = [head for _, head in edges]
+    assert len(heads) == len(set(heads)) == result["metrics"]["ast_nodes"] - 1
+
+
+def test_analyze_memoriza_resultado(monkeypatch):
+    """La misma consulta no vuelve a pasar por el pipeline y da el mismo resultado."""
+    import main
+
+    sql = "SELECT id, name FROM students WHERE age > 21;"
+    calls = []
+    uncached = main._analyze_uncached
+    monkeypatch.setattr(main, "_analyze_uncached", lambda *args: calls.append(args) or uncached(*args))
+    first = main.analyze(sql)
+    second = main.analyze(sql)
+    assert len(calls) == 1
+    assert first is not second
+    assert first["errors"] == second["errors"]
+    assert first["tokens_df"].equals(second["tokens_df"])
+    assert first["ast_text"] == second["ast_text"]
+
+
+def test_analyze_se_invalida_al_cambiar_el_esquema(monkeypatch):
+    """Un cambio en la fecha del esquema vuelve a ejecutar el análisis."""
+    import main
+
+    sql = "SELECT id FROM students WHERE age > 22;"
+    calls = []
+    uncached = main._analyze_uncached
+    monkeypatch.setattr(main, "_analyze_uncached", lambda *args: calls.append(args) or uncached(*args))
+    main.analyze(sql)
+    monkeypatch.setattr(main, "schema_mtime", lambda: -1)
+    main.analyze(sql)
+    assert len(calls) == 2
+
+
+def test_sqlite_omitido_con_palabra_mal_escrita():
+    """Con palabras reservadas mal escritas la consulta no llega a SQLite."""
+    from main import analyze
+
+    result = analyze("SELEC id FROM students;")
+    assert result["db_result_df"] is None
+    assert "no se envió a SQLite" in result["db_error"]
+
+
+def test_esquema_inaccesible_se_reporta_como_error_semantico(monkeypatch):
+    """Sin schema_simulado.json, analyze() devuelve el error semántico en vez de lanzar."""
+    import main
+
+    def missing(*_args):
+        raise FileNotFoundError(2, "No such file or directory", "schema_simulado.json")
+
+    monkeypatch.setattr(main, "schema_mtime", missing)
+    monkeypatch.setattr(main, "load_schema", missing)
+    assert main.analysis_cache_token()[-1] is None
+    result = main.analyze("SELECT id FROM students WHERE age > 23;")
+    assert result["phase"] == "semántica"
+    assert any(e.startswith("Error semántico:") and "schema_simulado.json" in e for e in result["errors"])
+
+
+def test_literal_parecido_a_reservada_llega_a_sqlite():
+    """Un literal o alias parecido a una palabra reservada no bloquea SQLite."""
+    from main import analyze
+
+    for sql in (
+        "SELECT name FROM students WHERE name = 'Fromm';",
+        "SELECT id AS frm FROM students;",
+    ):
+        result = analyze(sql)
+        assert result["errors"] == []
+        assert result["db_error"] is None
+        assert result["db_result_df"] is not None
+
+
+def test_select_tras_comentarios_llega_a_sqlite():
+    """Los comentarios iniciales no impiden reconocer la sentencia SELECT."""
+    from main import analyze
+
+    for sql in (
+        "-- comentario\nSELECT id FROM students;",
+        "/* varias\nlíneas */ SELECT id FROM students;",
+    ):
+        result = analyze(sql)
+        assert result["db_error"] is None
+        assert len(result["db_result_df"]) == 5
+
+
+def test_comentario_separador_largo_no_bloquea():
+    """Una línea separadora de guiones se descarta en tiempo lineal."""
+    import time
+    from main import analyze
+
+    start = time.perf_counter()
+    result = analyze("-- " + "-" * 2000 + "\nid FROM students;")
+    assert time.perf_counter() - start < 2.0
+    assert "solo se ejecutan sentencias SELECT" in result["db_error"]
+    result = analyze("-- " + "-" * 2000 + "\nSELECT id FROM students;")
+    assert len(result["db_result_df"]) == 5
+
+
+def test_columna_where_inexistente_se_reporta_una_vez():
+    """Cada identificador del WHERE se recoge una sola vez del AST."""
+    ast = parse_sql_to_ast("SELECT id FROM students WHERE agee > 1;")
+    _, _, errors = analyze_semantics(ast, load_schema())
+    assert errors == ["Columna inexistente en WHERE: agee"]
+
+
+def test_analyze_many_equivale_a_analisis_individual():
+    """El análisis por lotes devuelve lo mismo que una llamada por consulta."""
+    from semantic_analyzer import analyze_many
+
+    schema = load_schema()
+    asts = [parse_sql_to_ast(sql) for sql in samples if " name students" not in sql]
+    batch = analyze_many(asts, schema)
+    assert len(batch) == len(asts)
+    for ast, (symbols, types, errors) in zip(asts, batch):
+        single = analyze_semantics(ast, schema)
+        assert symbols == single[0]
+        assert list(types) == list(single[1])
+        assert errors == single[2]
+
+
+def test_analyze_reutiliza_analisis_semantico_del_ast(monkeypatch):
+    """Con el mismo texto, analyze() recibe el mismo AST y no repite la semántica."""
+    import main
+    import semantic_analyzer
+
+    sql = "SELECT id, gpa FROM students WHERE age > 24;"
+    calls = []
+    analyze_ast = semantic_analyzer._analyze
+    monkeypatch.setattr(semantic_analyzer, "_analyze", lambda *args: calls.append(args) or analyze_ast(*args))
+    first = main.analyze(sql)
+    # Otra clave de analyze() (sin grafo): vuelve a pasar por el pipeline
+    second = main.analyze(sql, build_graph=False)
+    assert first["ast"] is second["ast"]
+    assert len(calls) == 1
+    assert second["errors"] == first["errors"]
+    assert second["symbols_df"].equals(first["symbols_df"])
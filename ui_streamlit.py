@@ -1,13 +1,84 @@
 from __future__ import annotations
 
-import base64
-from io import BytesIO
+import re
 from pathlib import Path
 
 import pandas as pd
 import streamlit as st
 
-from main import analyze
+from main import analysis_cache_token, analyze
+
+
+@st.cache_data(persist="disk", max_entries=512, show_spinner=False)
+def _cached_analyze(sql: str, cache_token: tuple) -> dict:
+    # Cada rerun de Streamlit (toggle, botón) con el mismo texto reutiliza el
+    # resultado; el diccionario (DataFrames, AST, DOT) es serializable y se
+    # guarda en disco para reutilizarlo entre sesiones. cache_token
+    # (analysis_cache_token) solo forma parte de la clave: al editar el
+    # analizador o el esquema las entradas anteriores dejan de coincidir.
+    return analyze(sql)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _render_ast_png(dot_source: str) -> bytes:
+    # Ejecutar `dot` solo una vez por grafo, no en cada rerun
+    from graphviz import Source
+
+    return Source(dot_source).pipe(format="png")
+
+
+# Primera línea del archivo de ejemplos que empieza por SELECT (sin distinguir mayúsculas)
+_FIRST_SELECT_RE = re.compile(r"^[ \t]*SELECT\b.*$", re.IGNORECASE | re.MULTILINE)
+
+
+@st.cache_resource(show_spinner=False)
+def _load_examples() -> tuple[str, str | None]:
+    # (texto de assets/ejemplos.sql, primera línea SELECT); el archivo no cambia entre reruns.
+    # cache_resource devuelve la misma tupla inmutable sin deserializarla en cada rerun
+    examples_path = Path("assets/ejemplos.sql")
+    text = examples_path.read_text("utf-8") if examples_path.exists() else ""
+    match = _FIRST_SELECT_RE.search(text)
+    return text, (match.group(0).strip() if match else None)
+
+
+# Marca de color por categoría léxica, en una columna aparte de la tabla de tokens
+# (texto plano: st.dataframe lo muestra sin pasar por el Styler de pandas)
+TOKEN_TYPE_GLYPHS = {
+    "RESERVED": "🟦",
+    "IDENTIFIER": "🟩",
+    "OPERATOR": "🟧",
+    "NUMBER": "🟪",
+    "STRING": "🟥",
+    "SYMBOL": "⬜",
+}
+
+# Ejemplo correcto (código, nota) y contraejemplo que se muestran según la fase del error
+PHASE_EXAMPLES = {
+    "léxica": ("SELECT id, name FROM students;",
+               "Asegúrate de usar palabras reservadas correctas (SELECT, FROM, WHERE, etc.)"),
+    "sintáctica": ("SELECT col1, col2 FROM tabla WHERE col1 >= 0;",
+                   "Verifica la estructura: SELECT columnas FROM tabla [WHERE condición]"),
+    "semántica": ("SELECT id, name FROM students WHERE age > 18;",
+                  "Asegúrate de que las tablas y columnas existan en el esquema"),
+}
+DEFAULT_EXAMPLE = ("SELECT id, name FROM students WHERE age > 18;", None)
+PHASE_COUNTEREXAMPLES = {
+    "sintáctica": "SELECT col1 col2 FROM tabla  -- falta coma",
+}
+DEFAULT_COUNTEREXAMPLE = "SELECT id, apellido FROM students  -- 'apellido' no existe"
+
+# Filas de la tabla de tokens que se muestran antes de pedir la vista completa
+TOKEN_PREVIEW_ROWS = 500
+# Columnas de la tabla de símbolos en el orden en que se muestran
+SYMBOL_DISPLAY_COLS = ("Nombre", "Tipo", "Ámbito", "Categoría", "Tamaño", "Offset")
+# Footer institucional y créditos
+_FOOTER_HTML = """
+<div style="text-align:center; font-size: 0.9rem; opacity:0.85;">
+  <div><strong>Proyecto de aula — Universidad Simón Bolívar</strong></div>
+  <div>Simulador Didáctico de Compilador SQL</div>
+  <div>© Eduardo José Soto Herrera — Ingeniería de Sistemas. Todos los derechos reservados.</div>
+</div>
+"""
 
 
 st.set_page_config(page_title="Simulador Didáctico de Compilador SQL", layout="wide")
@@ -34,8 +105,7 @@ with st.expander("¿Qué subconjunto de SQL está soportado?", expanded=False):
         """
     )
 
-examples_path = Path("assets/ejemplos.sql")
-examples_text = examples_path.read_text("utf-8") if examples_path.exists() else ""
+examples_text, first_example_sql = _load_examples()
 
 # Estado de la app
 if "sql_text" not in st.session_state:
@@ -46,8 +116,9 @@ if "fase_idx" not in st.session_state:
     st.session_state.fase_idx = 3  # 1=lex,2=parse,3=semantica (por defecto todo)
 if "outcome" not in st.session_state:
     st.session_state.outcome = None
-if "last_analyzed_sql" not in st.session_state:
-    st.session_state.last_analyzed_sql = None
+if "last_analyzed_hash" not in st.session_state:
+    # hash() del último texto analizado: comparar enteros en cada rerun, no el script completo
+    st.session_state.last_analyzed_hash = None
 
 col_left, col_right = st.columns([2, 1])
 with col_left:
@@ -56,7 +127,7 @@ with col_left:
     if st.session_state.prefill_sql:
         st.session_state.sql_text = st.session_state.prefill_sql
         st.session_state.prefill_sql = None
-        st.session_state.last_analyzed_sql = None  # Resetear para forzar re-análisis
+        st.session_state.last_analyzed_hash = None  # Resetear para forzar re-análisis
     sql_text = st.text_area(
         label="Escribe tu consulta SQL",
         value=st.session_state.sql_text,
@@ -84,10 +155,9 @@ with col_right:
     )
     if st.button("Cargar primer ejemplo"):
         # Cargar la primera sentencia encontrada del archivo de ejemplos
-        for line in examples_text.splitlines():
-            if line.strip().upper().startswith("SELECT"):
-                st.session_state.prefill_sql = line.strip()
-                st.rerun()
+        if first_example_sql:
+            st.session_state.prefill_sql = first_example_sql
+            st.rerun()
         st.warning("No se encontraron SELECT en los ejemplos.")
 
 # Control de fases - ejecutar análisis cuando se presiona el botón o cambia el texto
@@ -95,7 +165,8 @@ fase_labels = {1: "léxica", 2: "sintáctica", 3: "semántica"}
 should_analyze = analyze_btn or (next_btn and step_mode)
 
 # Si cambió el texto, resetear el resultado anterior
-if st.session_state.last_analyzed_sql != sql_text:
+sql_hash = hash(sql_text)
+if st.session_state.last_analyzed_hash != sql_hash:
     st.session_state.outcome = None
     st.session_state.fase_idx = 3  # Resetear a fase completa
 
@@ -106,67 +177,321 @@ if should_analyze:
     else:
         st.session_state.fase_idx = 3
     
-    # Ejecutar análisis completo y mostrar según fase
-    outcome = analyze(sql_text)
-    st.session_state.outcome = outcome
-    st.session_state.last_analyzed_sql = sql_text
+    # Ejecutar análisis completo y mostrar según fase; "Siguiente fase" con el mismo
+    # texto solo mueve fase_idx y reutiliza el resultado de la sesión
+    outcome = st.session_state.outcome
+    if outcome is None or analyze_btn:
+        outcome = _cached_analyze(sql_text, analysis_cache_token())
+        st.session_state.outcome = outcome
+        st.session_state.last_analyzed_hash = sql_hash
 else:
     outcome = st.session_state.outcome
 
 fase_actual = st.session_state.fase_idx
 
-# Sección didáctica de errores (entre entrada y métricas)
+def _learning_zone(outcome: dict) -> None:
+    """
+    Sección didáctica de errores (entre entrada y métricas). No es un fragmento:
+    no contiene widgets propios y se redibuja con los controles globales
+    (Analizar, modo paso a paso), que siempre provocan un rerun completo.
+    """
+    errors = outcome.get("errors", [])
+    if not errors:
+        return
+    st.markdown("### 📚 Zona de Aprendizaje: Errores Detectados")
+    phase = outcome.get("phase", "")
+    if phase:
+        st.info(f"🔍 **Fase donde ocurrió el error:** {phase.capitalize()}")
+
+    previews = outcome.get("error_previews") or errors
+    snippet = outcome.get("error_snippet")
+    for idx, (error, error_preview) in enumerate(zip(errors, previews), 1):
+        with st.expander(f"❌ Error {idx}: {error_preview}", expanded=idx == 1):
+            st.error(f"**Detalle completo:** {error}")
+            if snippet and idx == 1:
+                st.markdown("**Código donde ocurrió el error:**")
+                st.code(snippet, language="sql")
+
+    hints = outcome.get("hints", [])
+    if hints:
+        st.markdown("#### 💡 Sugerencias para corregir:")
+        for hint in hints:
+            st.markdown(f"- {hint}")
+
+    # Ejemplos según la fase
+    st.markdown("#### ✅ Ejemplos correctos según la fase:")
+    example_code, example_caption = PHASE_EXAMPLES.get(phase, DEFAULT_EXAMPLE)
+    st.code(example_code, language="sql")
+    if example_caption:
+        st.caption(example_caption)
+
+    st.markdown("---")
+
+
 if outcome is not None:
+    _learning_zone(outcome)
+
+# Las pestañas con controles propios (toggle, botón) son fragmentos: una
+# interacción dentro de ellas vuelve a ejecutar solo esa pestaña y no el resto
+# del script. Las demás no tienen widgets y son funciones normales.
+@st.fragment
+def _tab_tokens(outcome: dict) -> None:
+    """Fase léxica: tabla de tokens."""
+    # Resultado REAL primero
+    st.markdown("### 🔍 Fase Léxica - Tokens Generados")
+    st.caption("Tokens generados por el analizador léxico (resultado real del compilador)")
+    tokens_df: pd.DataFrame | None = outcome.get("tokens_df")
+    if tokens_df is not None and not tokens_df.empty:
+        # Eliminar columnas 3 y 4 (linea y columna), mantener solo token y tipo
+        tokens_display = tokens_df[['token', 'tipo']]
+        # Consultas muy largas: se muestran solo las primeras filas salvo que se pida la tabla completa
+        total_tokens = len(tokens_display)
+        truncated = total_tokens > TOKEN_PREVIEW_ROWS and not st.toggle(
+            f"Mostrar los {total_tokens} tokens", value=False, key="show_all_tokens"
+        )
+        if truncated:
+            tokens_display = tokens_display.head(TOKEN_PREVIEW_ROWS)
+        # Sobre una categórica, map resuelve la marca una vez por tipo distinto y no por fila;
+        # "tipo" queda intacto y assign devuelve un frame nuevo (tokens_df cacheado no se toca)
+        glyphs = tokens_display["tipo"].astype("category").map(lambda tipo: TOKEN_TYPE_GLYPHS.get(tipo, ""))
+        tokens_display = tokens_display.assign(color=glyphs)
+        st.dataframe(
+            tokens_display,
+            use_container_width=True,
+            hide_index=True,
+            column_order=("color", "token", "tipo"),
+            column_config={
+                "color": st.column_config.TextColumn("", help="Color de la categoría léxica", width="small"),
+                "tipo": st.column_config.TextColumn("tipo", help="Categoría léxica del token"),
+            },
+        )
+        if truncated:
+            st.caption(f"Mostrando {TOKEN_PREVIEW_ROWS} de {total_tokens} tokens (+{total_tokens - TOKEN_PREVIEW_ROWS} más).")
+    else:
+        st.write("No se generaron tokens.")
+
+    # Sección didáctica separada
+    st.markdown("---")
+    with st.expander("📚 Explicación Didáctica: ¿Cómo funciona el Análisis Léxico?", expanded=False):
+        st.markdown("""
+        #### ¿Qué es el Análisis Léxico?
+        El análisis léxico es la **primera fase** de un compilador. Su función es convertir el código fuente
+        en una secuencia de **tokens** (unidades básicas del lenguaje).
+
+        #### ¿Qué es un Token?
+        Un token es la unidad más pequeña con significado en el lenguaje. Por ejemplo:
+        - **Palabras reservadas**: `SELECT`, `FROM`, `WHERE`, `AND`, `OR`
+        - **Identificadores**: Nombres de tablas, columnas (ej: `students`, `id`, `age`)
+        - **Operadores**: `=`, `!=`, `>`, `<`, `>=`, `<=`
+        - **Literales**: Números (`18`) y cadenas (`'texto'`)
+        - **Símbolos**: `,`, `;`, `(`, `)`
+
+        #### ¿Cómo funciona?
+        1. El analizador léxico **lee el código fuente** carácter por carácter
+        2. **Agrupa caracteres** según reglas definidas (palabras reservadas, identificadores, etc.)
+        3. **Genera tokens** con su categoría (tipo)
+        4. **Ignora espacios y comentarios** (dependiendo del lenguaje)
+
+        #### ¿Por qué es importante?
+        - **Separación de responsabilidades**: El léxico solo se preocupa de identificar tokens
+        - **Independiente de sintaxis**: No necesita entender la estructura completa
+        - **Eficiencia**: Puede procesar el código en una sola pasada
+        - **Manejo de errores**: Puede detectar caracteres inválidos o tokens mal formados
+
+        **Ejemplo**: `SELECT id FROM students` se convierte en:
+        - Token: `SELECT` (tipo: RESERVED)
+        - Token: `id` (tipo: IDENTIFIER)
+        - Token: `FROM` (tipo: RESERVED)
+        - Token: `students` (tipo: IDENTIFIER)
+        """)
+
+
+@st.fragment
+def _tab_ast(outcome: dict) -> None:
+    """Fase sintáctica: grafo y vista textual del AST."""
+    # AST REAL (como compilador)
+    st.markdown("### 🌳 Árbol de Sintaxis Abstracta (AST) - Resultado Real")
+    st.caption("Este es el AST generado por el compilador, mostrando solo los tokens organizados jerárquicamente según la estructura semántica.")
+
+    ast_dot = outcome.get("ast_dot")
+    if ast_dot is not None:
+        # Apagado, el DOT no se envía al navegador ni se maqueta en cada rerun
+        if st.toggle("Renderizar grafo AST", value=True, key="show_ast_graph"):
+            st.graphviz_chart(ast_dot, width="stretch")
+        # `dot` solo se ejecuta cuando se pide la imagen (rerun limitado a este fragmento);
+        # el PNG queda en la sesión junto al DOT del que salió, así el botón de
+        # descarga sigue visible en los reruns siguientes mientras el AST no cambie
+        if st.button("Preparar PNG", key="prepare_ast_png"):
+            try:
+                st.session_state.ast_png = (ast_dot, _render_ast_png(ast_dot))
+            except Exception:
+                st.session_state.ast_png = (ast_dot, None)
+        png_dot, png_bytes = st.session_state.get("ast_png") or (None, None)
+        if png_dot == ast_dot:
+            if png_bytes is not None:
+                st.download_button("Descargar AST (PNG)", data=png_bytes, file_name="ast.png", mime="image/png")
+            else:
+                st.caption("No se pudo generar el PNG (¿Graphviz instalado?).")
+    else:
+        st.write("No se pudo construir el AST.")
+
+    # Sección didáctica separada
+    st.markdown("---")
+    with st.expander("📚 Explicación Didáctica: ¿Cómo funciona el AST?", expanded=False):
+        st.markdown("""
+        #### ¿Qué es un AST?
+        El Árbol de Sintaxis Abstracta (AST) es una representación en árbol de la estructura sintáctica del código fuente.
+        En un compilador SQL real, el AST se construye **desde los tokens** generados por el analizador léxico.
+
+        #### Estructura del AST mostrado arriba:
+        - **SELECT (raíz)**: Representa la consulta completa
+        - **Columnas**: Tokens de las columnas seleccionadas (id, name, etc.)
+        - **FROM**: Palabra clave que indica la fuente de datos
+        - **Tabla**: Nombre de la tabla (students)
+        - **WHERE**: Cláusula de condición (opcional)
+        - **Operador**: Operador de comparación (>, <, =, etc.)
+        - **Left/Right**: Lado izquierdo y derecho de la comparación
+
+        #### ¿Por qué esta estructura?
+        En compiladores reales, el AST refleja la **semántica** del lenguaje, no solo la sintaxis.
+        La estructura jerárquica permite al compilador:
+        1. Validar la semántica (tablas y columnas existen)
+        2. Optimizar consultas
+        3. Generar código de ejecución
+
+        **Ejemplo**: `SELECT id, name FROM students WHERE age > 18`
+        - El AST agrupa `age`, `>`, `18` bajo el operador `>`
+        - Esto permite al compilador entender que es una comparación binaria
+        """)
+
+    # Vista textual del AST
+    with st.expander("Ver AST como lista jerárquica", expanded=False):
+        ast_text = outcome.get("ast_text")
+        if ast_text:
+            st.code(ast_text)
+        else:
+            st.write("AST no disponible.")
+
+
+def _tab_semantic(outcome: dict) -> None:
+    """Fase semántica: tablas de símbolos y de tipos."""
+    # Tablas REALES (como compilador)
+    st.markdown("### 🧩 Fase Semántica - Tablas de Símbolos y Tipos")
+    st.caption("Tablas generadas por el compilador según la literatura estándar de compiladores.")
+
+    symbols_df: pd.DataFrame | None = outcome.get("symbols_df")
+    types_df: pd.DataFrame | None = outcome.get("types_df")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("#### 📋 Tabla de Símbolos")
+        st.caption("Identificadores con su tipo, ámbito y categoría (como en compiladores reales)")
+        if symbols_df is not None and not symbols_df.empty:
+            # Mostrar columnas relevantes para compilador real; column_order selecciona
+            # en el cliente y evita copiar el DataFrame en cada rerun
+            st.dataframe(symbols_df, use_container_width=True, hide_index=True, column_order=SYMBOL_DISPLAY_COLS)
+        else:
+            st.write("Sin símbolos (posible error previo o SELECT vacío)")
+
+    with col2:
+        st.markdown("#### 📊 Tabla de Tipos")
+        st.caption("Información de tipos de datos de las columnas (nombre, tipo, tamaño, tabla, ámbito)")
+        if types_df is not None and not types_df.empty:
+            st.dataframe(types_df, use_container_width=True, hide_index=True)
+        else:
+            st.write("Sin tipos (posible error o SELECT con columnas inexistentes)")
+
+    # Sección didáctica separada
+    st.markdown("---")
+    with st.expander("📚 Explicación Didáctica: Tablas de Símbolos y Tipos", expanded=False):
+        st.markdown("""
+        #### ¿Qué es una Tabla de Símbolos?
+        La tabla de símbolos es una estructura de datos que almacena información sobre los identificadores
+        (nombres de variables, tablas, columnas) encontrados en el programa. En compiladores reales:
+
+        - **Nombre**: Identificador (ej: `students`, `id`, `age`)
+        - **Tipo**: Tipo de dato (ej: `INT`, `VARCHAR`, `TABLE`)
+        - **Ámbito **: Dónde es visible el símbolo (ej: `GLOBAL`, `students.SELECT`, `students.WHERE`)
+        - **Categoría**: Qué tipo de símbolo es (`table`, `column`, `variable`)
+
+        #### ¿Qué es una Tabla de Tipos?
+        La tabla de tipos almacena información detallada sobre los tipos de datos:
+        - **Nombre**: Nombre de la columna
+        - **Tipo**: Tipo de dato (INT, VARCHAR, etc.)
+        - **Tamaño**: Tamaño en bytes o caracteres
+        - **Tabla**: A qué tabla pertenece
+        - **Ámbito**: Dónde se usa (SELECT, WHERE, etc.)
+
+        #### ¿Por qué son importantes?
+        Estas tablas permiten al compilador:
+        1. **Validar existencia**: Verificar que tablas/columnas existen
+        2. **Verificar tipos**: Asegurar compatibilidad de tipos en operaciones
+        3. **Resolución de nombres**: Saber qué símbolo se refiere a qué
+        4. **Optimización**: Usar información de tipos para optimizar consultas
+        """)
+
+
+def _tab_db(outcome: dict) -> None:
+    """Resultado de la consulta en SQLite."""
+    st.markdown("### 🗂️ Resultado de la Consulta en SQLite real")
+    st.caption("Salida real del motor SQL didáctico (SQLite en memoria) utilizando los datos de ejemplo.")
+    db_df: pd.DataFrame | None = outcome.get("db_result_df")
+    db_error = outcome.get("db_error")
+
+    if db_df is not None:
+        if not db_df.empty:
+            st.success("La consulta se ejecutó correctamente en la base de datos simulada.")
+            st.dataframe(db_df, use_container_width=True, hide_index=True)
+        else:
+            st.info("La consulta se ejecutó, pero no devolvió filas.")
+    if db_error:
+        st.error(f"Error del motor SQL real: {db_error}")
+    if db_df is None and not db_error:
+        st.info("Ejecuta la consulta para visualizar el resultado real del motor SQL.")
+
+    summary = outcome.get("learning_summary")
+    if summary:
+        st.markdown("#### 📝 Resumen del recorrido completo")
+        st.write(summary)
+
+    st.markdown("---")
+    st.caption("La base incluye tablas: students, courses, enrollments con registros de ejemplo para practicar.")
+
+
+def _tab_errors(outcome: dict) -> None:
+    """Errores y guía de corrección."""
+    st.markdown("### ⚠️ Errores detectados")
     errors = outcome.get("errors", [])
     if errors:
-        st.markdown("### 📚 Zona de Aprendizaje: Errores Detectados")
-        phase = outcome.get("phase", "")
-        if phase:
-            st.info(f"🔍 **Fase donde ocurrió el error:** {phase.capitalize()}")
-        
-        for idx, error in enumerate(errors, 1):
-            error_preview = error[:80] + "..." if len(error) > 80 else error
-            with st.expander(f"❌ Error {idx}: {error_preview}", expanded=idx == 1):
-                st.error(f"**Detalle completo:** {error}")
-                snippet = outcome.get("error_snippet")
-                if snippet and idx == 1:
-                    st.markdown("**Código donde ocurrió el error:**")
-                    st.code(snippet, language="sql")
-        
+        snippet = outcome.get("error_snippet")
+        if snippet:
+            st.code(snippet)
+        # Un solo elemento por lista en lugar de uno por error/sugerencia
+        st.error("\n\n".join(f"❌ {e}" for e in errors))
         hints = outcome.get("hints", [])
         if hints:
-            st.markdown("#### 💡 Sugerencias para corregir:")
-            for hint in hints:
-                st.markdown(f"- {hint}")
-        
-        # Ejemplos según la fase
-        st.markdown("#### ✅ Ejemplos correctos según la fase:")
-        if phase == "léxica":
-            st.code("SELECT id, name FROM students;", language="sql")
-            st.caption("Asegúrate de usar palabras reservadas correctas (SELECT, FROM, WHERE, etc.)")
-        elif phase == "sintáctica":
-            st.code("SELECT col1, col2 FROM tabla WHERE col1 >= 0;", language="sql")
-            st.caption("Verifica la estructura: SELECT columnas FROM tabla [WHERE condición]")
-        elif phase == "semántica":
-            st.code("SELECT id, name FROM students WHERE age > 18;", language="sql")
-            st.caption("Asegúrate de que las tablas y columnas existan en el esquema")
-        else:
-            st.code("SELECT id, name FROM students WHERE age > 18;", language="sql")
-        
-        st.markdown("---")
+            phase = outcome.get("phase", "")
+            with st.expander(f"🛠️ Guía de corrección ({phase})", expanded=True):
+                st.markdown("#### Recomendaciones")
+                st.markdown("\n".join(f"- {h}" for h in hints))
+                st.markdown("#### Ejemplo correcto")
+                st.code(PHASE_EXAMPLES.get(phase, DEFAULT_EXAMPLE)[0], language="sql")
+                st.markdown("#### Contraejemplo")
+                st.code(PHASE_COUNTEREXAMPLES.get(phase, DEFAULT_COUNTEREXAMPLE), language="sql")
+    else:
+        st.success("No se detectaron errores")
+
 
 if outcome is not None:
     # KPIs rápidos
-    tok_df = outcome.get("tokens_df")
-    ast_obj = outcome.get("ast")
-    sym_df = outcome.get("symbols_df")
+    metrics = outcome.get("metrics") or {}
     k1, k2, k3 = st.columns(3)
     with k1:
-        st.metric("Tokens", outcome.get("metrics", {}).get("tokens", 0))
+        st.metric("Tokens", metrics.get("tokens", 0))
     with k2:
-        st.metric("Nodos AST", outcome.get("metrics", {}).get("ast_nodes", 0))
+        st.metric("Nodos AST", metrics.get("ast_nodes", 0))
     with k3:
-        st.metric("Símbolos", outcome.get("metrics", {}).get("symbols", 0))
+        st.metric("Símbolos", metrics.get("symbols", 0))
 
     tabs = st.tabs([
         "📜 Tabla de Tokens (Fase Léxica)",
@@ -177,237 +502,23 @@ if outcome is not None:
     ])
 
     with tabs[0]:
-        # Resultado REAL primero
-        st.markdown("### 🔍 Fase Léxica - Tokens Generados")
-        st.caption("Tokens generados por el analizador léxico (resultado real del compilador)")
-        tokens_df: pd.DataFrame | None = outcome.get("tokens_df")
-        if tokens_df is not None and not tokens_df.empty:
-            # Eliminar columnas 3 y 4 (linea y columna), mantener solo token y tipo
-            tokens_display = tokens_df[['token', 'tipo']].copy()
-            # Paleta suave acorde al tema
-            def color_row(row):
-                m = {
-                    "RESERVED": "#e3f2fd",
-                    "IDENTIFIER": "#e8f5e9",
-                    "OPERATOR": "#fff3e0",
-                    "NUMBER": "#f3e5f5",
-                    "STRING": "#fce4ec",
-                    "SYMBOL": "#f5f5f5",
-                }
-                return [f"background-color: {m.get(row['tipo'], '#ffffff')}; color:#111;" for _ in row]
-            styled = tokens_display.style.apply(color_row, axis=1).hide(axis="index")
-            st.dataframe(styled, use_container_width=True)
-        else:
-            st.write("No se generaron tokens.")
-        
-        # Sección didáctica separada
-        st.markdown("---")
-        with st.expander("📚 Explicación Didáctica: ¿Cómo funciona el Análisis Léxico?", expanded=False):
-            st.markdown("""
-            #### ¿Qué es el Análisis Léxico?
-            El análisis léxico es la **primera fase** de un compilador. Su función es convertir el código fuente
-            en una secuencia de **tokens** (unidades básicas del lenguaje).
-            
-            #### ¿Qué es un Token?
-            Un token es la unidad más pequeña con significado en el lenguaje. Por ejemplo:
-            - **Palabras reservadas**: `SELECT`, `FROM`, `WHERE`, `AND`, `OR`
-            - **Identificadores**: Nombres de tablas, columnas (ej: `students`, `id`, `age`)
-            - **Operadores**: `=`, `!=`, `>`, `<`, `>=`, `<=`
-            - **Literales**: Números (`18`) y cadenas (`'texto'`)
-            - **Símbolos**: `,`, `;`, `(`, `)`
-            
-            #### ¿Cómo funciona?
-            1. El analizador léxico **lee el código fuente** carácter por carácter
-            2. **Agrupa caracteres** según reglas definidas (palabras reservadas, identificadores, etc.)
-            3. **Genera tokens** con su categoría (tipo)
-            4. **Ignora espacios y comentarios** (dependiendo del lenguaje)
-            
-            #### ¿Por qué es importante?
-            - **Separación de responsabilidades**: El léxico solo se preocupa de identificar tokens
-            - **Independiente de sintaxis**: No necesita entender la estructura completa
-            - **Eficiencia**: Puede procesar el código en una sola pasada
-            - **Manejo de errores**: Puede detectar caracteres inválidos o tokens mal formados
-            
-            **Ejemplo**: `SELECT id FROM students` se convierte en:
-            - Token: `SELECT` (tipo: RESERVED)
-            - Token: `id` (tipo: IDENTIFIER)
-            - Token: `FROM` (tipo: RESERVED)
-            - Token: `students` (tipo: IDENTIFIER)
-            """)
-        
+        _tab_tokens(outcome)
         if step_mode and fase_actual == 1:
             st.stop()
 
     with tabs[1]:
-        # AST REAL (como compilador)
-        st.markdown("### 🌳 Árbol de Sintaxis Abstracta (AST) - Resultado Real")
-        st.caption("Este es el AST generado por el compilador, mostrando solo los tokens organizados jerárquicamente según la estructura semántica.")
-        
-        ast_graph = outcome.get("ast_graph")
-        if ast_graph is not None:
-            st.graphviz_chart(ast_graph.source, width="stretch")
-            try:
-                png_bytes = ast_graph.pipe(format="png")
-                st.download_button("Descargar AST (PNG)", data=png_bytes, file_name="ast.png", mime="image/png")
-            except Exception:
-                pass
-        else:
-            st.write("No se pudo construir el AST.")
-        
-        # Sección didáctica separada
-        st.markdown("---")
-        with st.expander("📚 Explicación Didáctica: ¿Cómo funciona el AST?", expanded=False):
-            st.markdown("""
-            #### ¿Qué es un AST?
-            El Árbol de Sintaxis Abstracta (AST) es una representación en árbol de la estructura sintáctica del código fuente.
-            En un compilador SQL real, el AST se construye **desde los tokens** generados por el analizador léxico.
-            
-            #### Estructura del AST mostrado arriba:
-            - **SELECT (raíz)**: Representa la consulta completa
-            - **Columnas**: Tokens de las columnas seleccionadas (id, name, etc.)
-            - **FROM**: Palabra clave que indica la fuente de datos
-            - **Tabla**: Nombre de la tabla (students)
-            - **WHERE**: Cláusula de condición (opcional)
-            - **Operador**: Operador de comparación (>, <, =, etc.)
-            - **Left/Right**: Lado izquierdo y derecho de la comparación
-            
-            #### ¿Por qué esta estructura?
-            En compiladores reales, el AST refleja la **semántica** del lenguaje, no solo la sintaxis.
-            La estructura jerárquica permite al compilador:
-            1. Validar la semántica (tablas y columnas existen)
-            2. Optimizar consultas
-            3. Generar código de ejecución
-            
-            **Ejemplo**: `SELECT id, name FROM students WHERE age > 18`
-            - El AST agrupa `age`, `>`, `18` bajo el operador `>`
-            - Esto permite al compilador entender que es una comparación binaria
-            """)
-        
-        # Vista textual del AST
-        with st.expander("Ver AST como lista jerárquica", expanded=False):
-            ast_text = outcome.get("ast_text")
-            if ast_text:
-                st.code(ast_text)
-            else:
-                st.write("AST no disponible.")
+        _tab_ast(outcome)
         if step_mode and fase_actual == 2:
             st.stop()
 
     with tabs[2]:
-        # Tablas REALES (como compilador)
-        st.markdown("### 🧩 Fase Semántica - Tablas de Símbolos y Tipos")
-        st.caption("Tablas generadas por el compilador según la literatura estándar de compiladores.")
-        
-        symbols_df: pd.DataFrame | None = outcome.get("symbols_df")
-        types_df: pd.DataFrame | None = outcome.get("types_df")
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown("#### 📋 Tabla de Símbolos")
-            st.caption("Identificadores con su tipo, ámbito y categoría (como en compiladores reales)")
-            if symbols_df is not None and not symbols_df.empty:
-                # Mostrar columnas relevantes para compilador real
-                display_cols = ['Nombre', 'Tipo', 'Ámbito', 'Categoría', 'Tamaño', 'Offset']
-                available_cols = [c for c in display_cols if c in symbols_df.columns]
-                if available_cols:
-                    st.dataframe(symbols_df[available_cols], use_container_width=True, hide_index=True)
-                else:
-                    st.dataframe(symbols_df, use_container_width=True, hide_index=True)
-            else:
-                st.write("Sin símbolos (posible error previo o SELECT vacío)")
-        
-        with col2:
-            st.markdown("#### 📊 Tabla de Tipos")
-            st.caption("Información de tipos de datos de las columnas (nombre, tipo, tamaño, tabla, ámbito)")
-            if types_df is not None and not types_df.empty:
-                st.dataframe(types_df, use_container_width=True, hide_index=True)
-            else:
-                st.write("Sin tipos (posible error o SELECT con columnas inexistentes)")
-        
-        # Sección didáctica separada
-        st.markdown("---")
-        with st.expander("📚 Explicación Didáctica: Tablas de Símbolos y Tipos", expanded=False):
-            st.markdown("""
-            #### ¿Qué es una Tabla de Símbolos?
-            La tabla de símbolos es una estructura de datos que almacena información sobre los identificadores
-            (nombres de variables, tablas, columnas) encontrados en el programa. En compiladores reales:
-            
-            - **Nombre**: Identificador (ej: `students`, `id`, `age`)
-            - **Tipo**: Tipo de dato (ej: `INT`, `VARCHAR`, `TABLE`)
-            - **Ámbito **: Dónde es visible el símbolo (ej: `GLOBAL`, `students.SELECT`, `students.WHERE`)
-            - **Categoría**: Qué tipo de símbolo es (`table`, `column`, `variable`)
-            
-            #### ¿Qué es una Tabla de Tipos?
-            La tabla de tipos almacena información detallada sobre los tipos de datos:
-            - **Nombre**: Nombre de la columna
-            - **Tipo**: Tipo de dato (INT, VARCHAR, etc.)
-            - **Tamaño**: Tamaño en bytes o caracteres
-            - **Tabla**: A qué tabla pertenece
-            - **Ámbito**: Dónde se usa (SELECT, WHERE, etc.)
-            
-            #### ¿Por qué son importantes?
-            Estas tablas permiten al compilador:
-            1. **Validar existencia**: Verificar que tablas/columnas existen
-            2. **Verificar tipos**: Asegurar compatibilidad de tipos en operaciones
-            3. **Resolución de nombres**: Saber qué símbolo se refiere a qué
-            4. **Optimización**: Usar información de tipos para optimizar consultas
-            """)
+        _tab_semantic(outcome)
 
     with tabs[3]:
-        st.markdown("### 🗂️ Resultado de la Consulta en SQLite real")
-        st.caption("Salida real del motor SQL didáctico (SQLite en memoria) utilizando los datos de ejemplo.")
-        db_df: pd.DataFrame | None = outcome.get("db_result_df")
-        db_error = outcome.get("db_error")
-
-        if db_df is not None:
-            if not db_df.empty:
-                st.success("La consulta se ejecutó correctamente en la base de datos simulada.")
-                st.dataframe(db_df, use_container_width=True, hide_index=True)
-            else:
-                st.info("La consulta se ejecutó, pero no devolvió filas.")
-        if db_error:
-            st.error(f"Error del motor SQL real: {db_error}")
-        if db_df is None and not db_error:
-            st.info("Ejecuta la consulta para visualizar el resultado real del motor SQL.")
-
-        summary = outcome.get("learning_summary")
-        if summary:
-            st.markdown("#### 📝 Resumen del recorrido completo")
-            st.write(summary)
-
-        st.markdown("---")
-        st.caption("La base incluye tablas: students, courses, enrollments con registros de ejemplo para practicar.")
+        _tab_db(outcome)
 
     with tabs[4]:
-        st.markdown("### ⚠️ Errores detectados")
-        errors = outcome.get("errors", [])
-        if errors:
-            snippet = outcome.get("error_snippet")
-            if snippet:
-                st.code(snippet)
-            for e in errors:
-                st.error(e)
-            hints = outcome.get("hints", [])
-            if hints:
-                phase = outcome.get("phase", "")
-                with st.expander(f"🛠️ Guía de corrección ({phase})", expanded=True):
-                    st.markdown("#### Recomendaciones")
-                    for h in hints:
-                        st.write("- ", h)
-                    st.markdown("#### Ejemplo correcto")
-                    if phase == "léxica":
-                        st.code("SELECT id, name FROM students", language="sql")
-                    elif phase == "sintáctica":
-                        st.code("SELECT col1, col2 FROM tabla WHERE col1 >= 0", language="sql")
-                    else:
-                        st.code("SELECT id, name FROM students WHERE age > 18", language="sql")
-                    st.markdown("#### Contraejemplo")
-                    if phase == "sintáctica":
-                        st.code("SELECT col1 col2 FROM tabla  -- falta coma", language="sql")
-                    else:
-                        st.code("SELECT id, apellido FROM students  -- 'apellido' no existe", language="sql")
-        else:
-            st.success("No se detectaron errores")
+        _tab_errors(outcome)
 
     st.markdown("---")
     st.caption(
@@ -423,16 +534,7 @@ else:
 
 # Footer institucional y créditos
 st.markdown("---")
-st.markdown(
-    """
-    <div style="text-align:center; font-size: 0.9rem; opacity:0.85;">
-      <div><strong>Proyecto de aula — Universidad Simón Bolívar</strong></div>
-      <div>Simulador Didáctico de Compilador SQL</div>
-      <div>© Eduardo José Soto Herrera — Ingeniería de Sistemas. Todos los derechos reservados.</div>
-    </div>
-    """,
-    unsafe_allow_html=True,
-)
+st.markdown(_FOOTER_HTML, unsafe_allow_html=True)
 
 
 